@@ -11,6 +11,8 @@ from helpers.jsonGen import situation_dict,montants_fin,montants_immo,montants_e
 from helpers.simul_contraint_main_sous_cat_v2 import simul_obj_client_from_dicts,import_json,impute_json
 from helpers.auth import check_password
 from helpers.func import *
+from helpers import jobs
+from helpers import store
 
 
 def render_dict_inputs(name, data):
@@ -103,13 +105,50 @@ def display_customer_info(client_data):
         """, unsafe_allow_html=True)
 
 
+def display_fill_score(score_quality, time_elapsed):
+    st.subheader(f"Temps de réponse FillScore: {time_elapsed} secondes")
+    if score_quality: 
+        df = pd.DataFrame({
+            'Metriques': list(score_quality.keys()),
+            'Scores': list(score_quality.values())
+        })
+        # Create the plot
+        fig = px.bar(df,
+                    x='Scores',
+                    y='Metriques',
+                    orientation='h',
+                    text='Scores',
+                    color='Metriques',  # Different color for each metric
+                    color_discrete_sequence=px.colors.qualitative.Plotly,
+                    range_x=[0, 100],  # Fixed scale to 100
+                    title='Score de qualité de remplissage')
+
+        # Customize the layout
+        fig.update_layout(
+            height=500,
+            showlegend=False,
+            xaxis_title='Score (sur 100)',
+            yaxis_title='Metriques',
+            hovermode='y unified'
+        )
+
+        # Format the text on bars
+        fig.update_traces(texttemplate='%{x:.1f}', 
+                        textposition='outside',
+                        marker_line_color='rgb(8,48,107)',
+                        marker_line_width=1.5)
+
+        # Display in Streamlit
+        st.plotly_chart(fig, use_container_width=True)
+
+    st.write(f"Score Total des Infos Patrimoniales :{score_quality.get('Total', 0)}")
+
+
 def main():
     # Streamlit UI
     # Title and description
     global situation_dict,montants_fin,montants_immo,montants_emprunt,montants_pro,ENUM_OPTIONS
 
-    if 'json_proj' not in st.session_state:
-        st.session_state.json_proj = None
     if 'json_synth_id' not in st.session_state:
         st.session_state.json_synth_id = None
     # Initialize session state with your imported dictionaries
@@ -123,9 +162,10 @@ def main():
         st.session_state.montants_emprunt = montants_emprunt
     if 'montants_pro' not in st.session_state:
         st.session_state.montants_pro = montants_pro
-    if 'input_json' not in st.session_state:
+    # gros JSON : la session n'en garde que la clé (helpers.store)
+    if 'cle_input_json' not in st.session_state:
         input_json = import_json("json/vide_new.json")
-        st.session_state.input_json = input_json
+        store.garder("input_json", input_json)
 
     st.title("👋🏻 HOME PAGE 🏠 - API Algo Klemo")
 
@@ -156,11 +196,11 @@ def main():
                                        st.session_state.montants_emprunt)
         fresh_json = import_json("json/vide_new.json")
         impute_json(fresh_json,p1)
-        st.session_state.input_json = fresh_json
+        store.garder("input_json", fresh_json)
         
         if st.button("Generate JSON"):
-            st.json(st.session_state.input_json)
-            st.download_button("Download JSON", json.dumps(st.session_state.input_json, indent=2), file_name="client_situation.json", mime="application/json")
+            st.json(store.reprendre("input_json"))
+            st.download_button("Download JSON", json.dumps(store.reprendre("input_json"), indent=2), file_name="client_situation.json", mime="application/json")
         
     with st.expander("📁 PART 1 : API FillScore", expanded=True):
         # uploaded_file = st.file_uploader("Choisir un fichier JSON", type="json")
@@ -181,7 +221,7 @@ def main():
         # --- Display text area depending on mode ---
         if mode == "Entrer un JSON manuellement":
             # Show a blank (or last known) JSON to edit
-            default_value = json.dumps(st.session_state.get("input_json", {}), indent=2)
+            default_value = json.dumps(store.reprendre("input_json", {}), indent=2)
             fs_content = st.text_area(
                 ":black_nib: Entrer Infos JSON :",
                 value=default_value,
@@ -190,71 +230,33 @@ def main():
             )
         else:
             # Use previous JSON directly
-            fs_content = json.dumps(st.session_state.get("input_json", {}), indent=2)
+            fs_content = json.dumps(store.reprendre("input_json", {}), indent=2)
             st.code(fs_content, language="json")
 
         # st.text_area("Charged Payload FastPat", json.dumps(st.session_state.input_json, indent=2), height=300, key="fastpat_content")
 
         # Button to send the request
         if st.button("Envoyer une requête à l'API FillScore"):
-            if st.session_state.input_json: 
-                try:
-                    # Call the API with the parsed JSON
-                    json_proj, time_elapsed = call_api(st.session_state.input_json,FILL_SCORE_URL)
-                    st.session_state.json_proj = json_proj["output"]
-                    
-                    if json_proj:
-                        st.subheader(f"Temps de réponse FillScore: {time_elapsed} secondes")
-                        score_quality = json_proj["output"].get("ScoreQuality", {})
-
-                        if score_quality: 
-                            df = pd.DataFrame({
-                                'Metriques': list(score_quality.keys()),
-                                'Scores': list(score_quality.values())
-                            })
-                            # Create the plot
-                            fig = px.bar(df,
-                                        x='Scores',
-                                        y='Metriques',
-                                        orientation='h',
-                                        text='Scores',
-                                        color='Metriques',  # Different color for each metric
-                                        color_discrete_sequence=px.colors.qualitative.Plotly,
-                                        range_x=[0, 100],  # Fixed scale to 100
-                                        title='Score de qualité de remplissage')
-                            
-                            # Customize the layout
-                            fig.update_layout(
-                                height=500,
-                                showlegend=False,
-                                xaxis_title='Score (sur 100)',
-                                yaxis_title='Metriques',
-                                hovermode='y unified'
-                            )
-                            
-                            # Format the text on bars
-                            fig.update_traces(texttemplate='%{x:.1f}', 
-                                            textposition='outside',
-                                            marker_line_color='rgb(8,48,107)',
-                                            marker_line_width=1.5)
-                            
-                            # Display in Streamlit
-                            st.plotly_chart(fig, use_container_width=True)
-
-                        st.write(f"Score Total des Infos Patrimoniales :{score_quality.get('Total', 0)}")
-
-                        # Display the JSON response in a readable format
-                    else:
-                        st.error("Failed to get a valid response from the API.")
-                except json.JSONDecodeError:
-                    st.error("Invalid JSON format in the input.")
+            input_json = store.reprendre("input_json")
+            if input_json: 
+                # appel FillScore dans un job (helpers.jobs), suivi aux reruns
+                st.session_state.fill_score = None
+                jobs.soumettre("job_fill_score", jobs.job_fill_score, input_json)
             else:
                 st.error("Please enter a JSON payload.")
 
+        fill_score = jobs.suivre_job("job_fill_score")
+        if fill_score is not None:
+            store.garder("json_proj", fill_score["json_proj"])
+            st.session_state.fill_score = {"score_quality": fill_score["json_proj"].get("ScoreQuality", {}),
+                                           "temps": fill_score["temps"]}
+        if st.session_state.get("fill_score"):
+            display_fill_score(st.session_state.fill_score["score_quality"], st.session_state.fill_score["temps"])
+
     with st.expander("📈 PART 2 : API Synthèse Patrimoniale (BilanPat)", expanded=True):
     # Display the full API response in another text area
 
-        if st.session_state.json_proj: 
+        if store.reprendre("json_proj"): 
             # Text area for the next API call
             st.subheader("API de Projection d'un bilan patrimonial")
             # st.text_area("Payload for API Bilan Pat", json.dumps(json_proj, indent=2), height=300, key="bilanpat_content")
@@ -268,7 +270,7 @@ def main():
             # --- Display text area depending on mode ---
             if mode_bilan == "B - Entrer un JSON manuellement":
                 # Show a blank (or last known) JSON to edit
-                default_value = json.dumps(st.session_state.get("json_proj", {}), indent=2)
+                default_value = json.dumps(store.reprendre("json_proj", {}), indent=2)
                 bp_content = st.text_area(
                     ":black_nib: Entrer Infos JSON :",
                     value=default_value,
@@ -278,32 +280,13 @@ def main():
             
             else:
                 # Use previous JSON directly
-                bp_content = json.dumps(st.session_state.get("json_proj", {}), indent=2)
+                bp_content = json.dumps(store.reprendre("json_proj", {}), indent=2)
                 # st.code(bp_content, language="json")
-            st.session_state.json_proj = json.loads(bp_content)
+            store.garder("json_proj", json.loads(bp_content))
             
-            if st.button("Envoyer une Requête à l'API BilanPat (Projection)"):
-                if st.session_state.json_proj: 
-                    try:
-                        # Call the API with the parsed JSON
-                        json_synth, time_elapsed = call_api(st.session_state.json_proj,PROJ_URL)
-                        
-                        if json_synth:
-                            st.session_state.json_synth_id = json_synth["requestId"]
-                            st.session_state.json_synth_key = json_synth["requestKey"]
-                        
-                            st.subheader(f"Temps de réponse BilanPat: {time_elapsed} secondes")
-                            st.write(f"Résultats json enregistrés dans un bucket s3 avec suffix:{json_synth['requestKey']}")
-
-                            display_bilan_synth(json_synth)
-
-                            # Display the JSON response in a readable format
-                        else:
-                            st.error("Failed to get a valid response from the API.")
-                    except json.JSONDecodeError:
-                        st.error("Invalid JSON format in the input.")
-                else:
-                    st.error("Please enter a JSON payload.")
+            # Proj dans un job, bilan affiché par section_bilan comme sur les pages
+            jobs.section_bilan(store.reprendre("json_proj"), fn=jobs.job_proj,
+                               bouton="Envoyer une Requête à l'API BilanPat (Projection)")
 
     with st.expander("💡 PART 3 : API Recommandations (StratPat)", expanded=True):
     # Display the full API response in another text area
@@ -348,33 +331,15 @@ def main():
             # json_proj = json.loads(json_proj)
             # if st.button("Send Request to our API StratPat"):
                 if st.session_state.json_synth_id: 
-                    try:
-                        # Call the API with the parsed JSON
-                        init_strat, time_elapsed = call_api(st.session_state.payload_strat,STRAT_INIT_URL)
-                
-                        if init_strat:
-                            request_id     = st.session_state.payload_strat.get("requestId")
-                            strat_result = poll_result(STRAT_URL,request_id)
-                            print("debugging: strat_result",strat_result)
-                            strat_output = strat_result.json()["output"]
-                            
-                            display_strat_output(selected_objectif,selected_sous_objectif,st.session_state.payload_strat, strat_output)
-
-                            # best_key, best_element = max(strat_output_cleaned.items(),key=lambda x: x[1]["attribut"]["metrique1"]["value"])
-
-                            # st.write(f'Title of reco: {best_element["variantesResult"][0]["metriques"]["libVariante"]}')
-                            # st.write(f'Main metric: {best_element["attribut"]["metrique1"]["description"]}')
-                            # st.write(f'Secondary metric {best_element["attribut"]["metrique2"]["description"]}')
-                            
-
-                            # Display the JSON response in a readable format
-                        else:
-                            st.error("Failed to get a valid response from the API.")
-                    except json.JSONDecodeError:
-                        st.error("Invalid JSON format in the input.")
+                    jobs.soumettre("job_strat", jobs.job_strat, st.session_state.payload_strat,
+                                   selected_objectif, selected_sous_objectif)
                 else:
                     st.error("Please enter a JSON payload.")
 
+            reco = jobs.suivre_job("job_strat")
+            if reco is not None:
+                display_strat_output(reco["objectif"], reco["sous_objectif"], st.session_state.payload_strat, reco["output"])
+
         # # Button to call the next API
         # if st.button("Call Next API"):
         #     # Here you can add the code to call the next API with the payload from the text area
@@ -388,6 +353,9 @@ def main():
         #     else:
         #         st.error("Failed to get a valid response from the API.")
 
+    # rerun tant qu'un job FillScore, Proj ou StratPat tourne
+    jobs.rafraichir_jobs("job_fill_score", "job_bilan", "job_strat")
+
 if __name__ == "__main__":
     if check_password():
         main()
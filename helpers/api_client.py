@@ -0,0 +1,179 @@
+import copy
+import gzip
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+################################
+##### CLIENT HTTP PARTAGE ####
+################################
+# Un seul requests.Session par processus : les connexions TLS vers l'API Algo sont
+# gardées ouvertes (keep-alive) et réutilisées d'un appel à l'autre, au lieu d'un
+# handshake par requests.post / requests.get.
+# Les requêtes identiques simultanées passées avec une clé (double clic, rerun,
+# plusieurs testeurs sur le même persona) partagent un seul appel HTTP : voir
+# VolsEnCours. L'appelant ne donne de clé qu'aux endpoints sans état serveur.
+
+# (connexion, lecture) en secondes
+TIMEOUT_DEFAUT = (5, 60)
+
+# codes relancés automatiquement, avec backoff exponentiel et respect de Retry-After
+STATUTS_RELANCES = (429, 500, 502, 503, 504)
+
+# corps de requête compressés en gzip à partir de cette taille (octets), si activé
+SEUIL_COMPRESSION = 1024
+
+
+class _Vol:
+
+    def __init__(self, en_vol):
+        self.fini = threading.Event()
+        self.en_vol = en_vol
+        self.resultat = None
+        self.erreur = None
+
+
+class VolsEnCours:
+    """Single-flight : un seul appel en vol par clé.
+
+    Les appelants concurrents de même clé attendent le premier et partagent son
+    résultat, ou son exception. La clé est oubliée dès la fin de l'appel : rien
+    n'est mis en cache au-delà (c'est le rôle de helpers.cache).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._vols = {}
+        self.appels = 0
+        self.coalesces = 0
+        self.max_en_vol = 0
+
+    def executer(self, cle, fn):
+        """(fn(), vol) pour le premier appelant de la clé, (résultat partagé, None) pour les suivants."""
+        with self._lock:
+            self.appels += 1
+            vol = self._vols.get(cle)
+            meneur = vol is None
+            if meneur:
+                vol = self._vols[cle] = _Vol(len(self._vols) + 1)
+                self.max_en_vol = max(self.max_en_vol, vol.en_vol)
+            else:
+                self.coalesces += 1
+        if not meneur:
+            vol.fini.wait()
+            if vol.erreur is not None:
+                raise vol.erreur
+            return vol.resultat, None
+        try:
+            vol.resultat = fn()
+            return vol.resultat, vol
+        except BaseException as e:
+            vol.erreur = e
+            raise
+        finally:
+            with self._lock:
+                del self._vols[cle]
+            vol.fini.set()
+
+    def stats(self):
+        with self._lock:
+            return {"en_vol": len(self._vols), "max_en_vol": self.max_en_vol,
+                    "appels": self.appels, "coalesces": self.coalesces}
+
+
+class KlemoApiClient:
+    """Client HTTP poolé et signé (SigV4) vers l'API Algo Klemo.
+
+    timeouts : {préfixe d'URL: (connexion, lecture)} ; le préfixe le plus long
+    correspondant à l'URL appelée s'applique.
+    compression : corps de requête envoyés en gzip (Content-Encoding), ce que
+    l'API Gateway doit accepter (minimumCompressionSize). Les réponses gzip sont
+    toujours acceptées et décompressées.
+    coalescence : les requêtes passées avec une clé (`cle=`) sont dédupliquées
+    tant qu'elles sont en vol (VolsEnCours).
+    Chaque réponse porte `octets` : tailles brutes et sur le fil, envoi et réception ;
+    `coalesce` : réponse partagée avec un appel identique déjà en vol ;
+    `en_vol` : appels distincts en vol à l'envoi (None si coalescée ou sans clé).
+    """
+
+    def __init__(self, auth=None, timeouts=None, pool_connections=4, pool_maxsize=16,
+                 retries=3, backoff_factor=0.5, compression=False, seuil_compression=SEUIL_COMPRESSION,
+                 coalescence=True):
+        self.auth = auth
+        self.vols = VolsEnCours() if coalescence else None
+        self.timeouts = dict(timeouts or {})
+        self.compression = compression
+        self.seuil_compression = seuil_compression
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=0,
+            status=retries,
+            status_forcelist=STATUTS_RELANCES,
+            allowed_methods=None,  # POST compris : les appels de l'API sont rejouables
+            backoff_factor=backoff_factor,
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        self.adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                                   max_retries=retry, pool_block=True)
+        # le pool de connexions de l'adaptateur est thread-safe : la Session est
+        # partagée entre les threads de script Streamlit
+        self.session = requests.Session()
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+
+    def timeout_for(self, url):
+        prefixes = [prefixe for prefixe in self.timeouts if url.startswith(prefixe)]
+        if not prefixes:
+            return TIMEOUT_DEFAUT
+        return self.timeouts[max(prefixes, key=len)]
+
+    def request(self, method, url, data=None, headers=None, cle=None, **kwargs):
+        """cle : empreinte du payload canonique ; les appels simultanés de même (method, url, cle) n'en font qu'un."""
+        if cle is None or self.vols is None:
+            response = self._envoyer(method, url, data, headers, **kwargs)
+            response.coalesce, response.en_vol = False, None
+            return response
+        response, vol = self.vols.executer((method, url, cle),
+                                           lambda: self._envoyer(method, url, data, headers, **kwargs))
+        if vol is not None:
+            response.coalesce, response.en_vol = False, vol.en_vol
+            return response
+        # copie par appelant : ses attributs ne sont pas partagés
+        partagee = copy.copy(response)
+        partagee.octets = response.octets
+        partagee.coalesce, partagee.en_vol = True, None
+        return partagee
+
+    def _envoyer(self, method, url, data=None, headers=None, **kwargs):
+        kwargs.setdefault("auth", self.auth)
+        kwargs.setdefault("timeout", self.timeout_for(url))
+        headers = dict(headers or {})
+        headers.setdefault("Accept-Encoding", "gzip, deflate")
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        octets_env = len(data) if isinstance(data, bytes) else 0
+        if self.compression and octets_env >= self.seuil_compression:
+            data = gzip.compress(data, compresslevel=6)
+            headers["Content-Encoding"] = "gzip"
+        response = self.session.request(method, url, data=data, headers=headers, **kwargs)
+        response.octets = {
+            "env": octets_env,
+            "env_fil": len(data) if isinstance(data, bytes) else 0,
+            "rec": len(response.content),
+            # octets lus sur la socket, avant décompression
+            "rec_fil": response.raw.tell()
+        }
+        return response
+
+    def post(self, url, data=None, **kwargs):
+        return self.request("POST", url, data=data, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def close(self):
+        self.session.close()
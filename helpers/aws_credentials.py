@@ -0,0 +1,127 @@
+import os
+import threading
+from datetime import datetime, timezone
+
+import requests
+import streamlit as st
+from requests_aws4auth import AWS4Auth
+
+
+################################
+##### IDENTIFIANTS AWS ####
+################################
+# Signature SigV4 des appels à l'API Algo, résolue au premier appel et non à
+# l'import : aucune session boto3 tant qu'aucune requête ne part. Un seul
+# fournisseur par processus, partagé par toutes les pages. Avec des identifiants
+# temporaires (jeton de session), un thread de fond les renouvelle avant expiration
+# et remplace l'AWS4Auth en cache.
+
+REGION_DEFAUT = "eu-west-1"
+SERVICE = "execute-api"
+# renouvellement anticipé des identifiants temporaires (secondes avant expiration)
+MARGE_RENOUVELLEMENT = 10 * 60
+# délai minimal entre deux renouvellements (et nouvel essai après une erreur), secondes
+DELAI_MIN_RENOUVELLEMENT = 60.0
+
+
+def get_aws_credentials():
+    """
+    Get AWS credentials from either Vercel environment variables (production)
+    or Streamlit secrets (local development)
+    """
+    # Try to get from Vercel environment variables first
+    aws_access_key = os.getenv('AWS_ACCESS_KEY_ID')
+    aws_secret_key = os.getenv('AWS_SECRET_ACCESS_KEY')
+    aws_region = os.getenv('AWS_DEFAULT_REGION', REGION_DEFAUT)
+
+    # If not found in environment variables, try Streamlit secrets (for local development)
+    if not aws_access_key or not aws_secret_key:
+        try:
+            aws_access_key = st.secrets["AWS"]["ACCESS_KEY"]
+            aws_secret_key = st.secrets["AWS"]["SECRET_KEY"]
+            aws_region = st.secrets["AWS"].get("REGION", REGION_DEFAUT)
+        except (KeyError, AttributeError, FileNotFoundError):
+            # secrets not available either: boto3 default chain (profile, instance role...)
+            aws_access_key = None
+            aws_secret_key = None
+
+    return aws_access_key, aws_secret_key, aws_region
+
+
+class IdentifiantsAWSManquants(RuntimeError):
+    """Aucun identifiant AWS trouvé : la requête ne peut pas être signée."""
+
+
+class FournisseurAuthAWS(requests.auth.AuthBase):
+    """
+    Auth requests paresseuse : s'utilise partout où un AWS4Auth est attendu
+    (KlemoApiClient, requests.post(auth=...)) et ne résout les identifiants qu'à
+    la première requête signée.
+    """
+
+    def __init__(self, service=SERVICE, marge=MARGE_RENOUVELLEMENT):
+        self.service = service
+        self.marge = marge
+        self.region = None
+        self.source = None
+        self._credentials = None
+        self._auth = None
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def _resoudre(self):
+        import boto3
+
+        aws_access_key, aws_secret_key, self.region = get_aws_credentials()
+        self.source = "environnement / secrets" if aws_access_key else "chaîne boto3"
+        session = boto3.Session(aws_access_key_id=aws_access_key,
+                                aws_secret_access_key=aws_secret_key,
+                                region_name=self.region)
+        self._credentials = session.get_credentials()
+        if self._credentials is None:
+            raise IdentifiantsAWSManquants("🔐 No AWS credentials found in environment variables, secrets or boto3 chain")
+
+    def _signer(self):
+        # get_frozen_credentials renouvelle les identifiants temporaires si besoin
+        figes = self._credentials.get_frozen_credentials()
+        self._auth = AWS4Auth(figes.access_key, figes.secret_key, self.region, self.service,
+                              session_token=figes.token)
+        self._planifier()
+
+    def _planifier(self, delai=None):
+        if delai is None:
+            # attribut privé de botocore (RefreshableCredentials) : absent ou d'un autre
+            # type selon la version, on ne planifie alors rien et botocore renouvelle seul
+            expiration = getattr(self._credentials, "_expiry_time", None)
+            if not isinstance(expiration, datetime) or expiration.tzinfo is None:
+                return
+            delai = (expiration - datetime.now(timezone.utc)).total_seconds() - self.marge
+        # une expiration déjà dans la marge ne relance pas le renouvellement en boucle
+        self._timer = threading.Timer(max(delai, DELAI_MIN_RENOUVELLEMENT), self._renouveler)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _renouveler(self):
+        try:
+            with self._lock:
+                self._signer()
+        except Exception as e:
+            print(f"Error refreshing AWS credentials: {e}")
+            # nouvel essai après le délai minimal ; entre-temps l'auth courante reste valide
+            self._planifier(DELAI_MIN_RENOUVELLEMENT)
+
+    def auth(self):
+        """AWS4Auth courant, créé au premier appel."""
+        if self._auth is None:
+            with self._lock:
+                if self._auth is None:
+                    self._resoudre()
+                    self._signer()
+        return self._auth
+
+    def __call__(self, r):
+        return self.auth()(r)
+
+
+# fournisseur unique du processus
+AUTH_AWS = FournisseurAuthAWS()
@@ -0,0 +1,107 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+
+################################
+##### CACHE DES REPONSES API ####
+################################
+# Cache disque adressé par contenu : la clé est le sha256 de l'endpoint et du payload
+# canonicalisé (clés triées, séparateurs compacts), un fichier JSON par réponse.
+# Taille totale bornée avec éviction LRU (date d'accès = mtime du fichier) et
+# expiration après `ttl` secondes. Partagé entre threads (pages Streamlit, pipeline).
+
+CACHE_DOSSIER = os.getenv("KLEMO_CACHE_DIR", ".cache/api")
+CACHE_TAILLE_MAX = 256 * 1024 * 1024  # octets
+CACHE_TTL = 24 * 3600  # secondes
+
+
+def cle_cache(api_url, json_payload):
+    canonique = json.dumps(json_payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(f"{api_url}\n{canonique}".encode("utf-8")).hexdigest()
+
+
+class ReponseCache:
+    """Cache LRU sur disque des réponses JSON, avec TTL et compteurs hits / misses."""
+
+    def __init__(self, dossier=CACHE_DOSSIER, taille_max=CACHE_TAILLE_MAX, ttl=CACHE_TTL):
+        self.dossier = dossier
+        self.taille_max = taille_max
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # index en mémoire {clé: (dernier accès, taille)}, reconstruit depuis le disque
+        self._index = {}
+        if os.path.isdir(dossier):
+            for fichier in os.listdir(dossier):
+                if fichier.endswith(".json"):
+                    stat = os.stat(os.path.join(dossier, fichier))
+                    self._index[fichier[:-5]] = (stat.st_mtime, stat.st_size)
+
+    def _chemin(self, cle):
+        return os.path.join(self.dossier, f"{cle}.json")
+
+    def get(self, cle):
+        """Réponse en cache ou None (absente ou expirée)."""
+        with self._lock:
+            if cle in self._index:
+                try:
+                    with open(self._chemin(cle), encoding="utf-8") as f:
+                        entree = json.load(f)
+                except (OSError, ValueError):
+                    entree = None
+                if entree is not None and time.time() - entree["ts"] <= self.ttl:
+                    maintenant = time.time()
+                    os.utime(self._chemin(cle), (maintenant, maintenant))
+                    self._index[cle] = (maintenant, self._index[cle][1])
+                    self.hits += 1
+                    return entree["reponse"]
+                self._supprimer(cle)
+            self.misses += 1
+            return None
+
+    def put(self, cle, reponse):
+        contenu = json.dumps({"ts": time.time(), "reponse": reponse}, ensure_ascii=False).encode("utf-8")
+        if len(contenu) > self.taille_max:
+            return
+        with self._lock:
+            os.makedirs(self.dossier, exist_ok=True)
+            temporaire = f"{self._chemin(cle)}.{threading.get_ident()}.tmp"
+            with open(temporaire, "wb") as f:
+                f.write(contenu)
+            os.replace(temporaire, self._chemin(cle))
+            self._index[cle] = (time.time(), len(contenu))
+            self._evincer()
+
+    def _supprimer(self, cle):
+        self._index.pop(cle, None)
+        try:
+            os.remove(self._chemin(cle))
+        except FileNotFoundError:
+            pass
+
+    def _evincer(self):
+        taille = sum(t for _, t in self._index.values())
+        for cle in sorted(self._index, key=lambda c: self._index[c][0]):
+            if taille <= self.taille_max:
+                break
+            taille -= self._index[cle][1]
+            self._supprimer(cle)
+
+    def clear(self):
+        with self._lock:
+            for cle in list(self._index):
+                self._supprimer(cle)
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entrees": len(self._index),
+                "octets": sum(t for _, t in self._index.values())
+            }
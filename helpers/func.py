@@ -2,71 +2,109 @@ import streamlit as st
 import os 
 import requests
 import json
-import boto3
-from requests_aws4auth import AWS4Auth
 import pandas as pd 
 import plotly.express as px
 import time
+import random
+from urllib.parse import urlparse
+from helpers.api_client import KlemoApiClient
+from helpers.aws_credentials import AUTH_AWS, IdentifiantsAWSManquants, get_aws_credentials
+from helpers.cache import ReponseCache, cle_cache
+from helpers.projection import PROJECTION_PROJ, projeter
+from helpers.metrics import chrono, enregistrer, mesures_octets, nb_retries
 
 
-def get_aws_credentials():
-    """
-    Get AWS credentials from either Vercel environment variables (production)
-    or Streamlit secrets (local development)
-    """
-    # Try to get from Vercel environment variables first
-    aws_access_key = os.getenv('AWS_ACCESS_KEY_ID')
-    aws_secret_key = os.getenv('AWS_SECRET_ACCESS_KEY')
-    aws_region = os.getenv('AWS_DEFAULT_REGION', 'eu-west-1')
-    
-    # If not found in environment variables, try Streamlit secrets (for local development)
-    if not aws_access_key or not aws_secret_key:
-        try:
-            aws_access_key = st.secrets["AWS"]["ACCESS_KEY"]
-            aws_secret_key = st.secrets["AWS"]["SECRET_KEY"]
-            aws_region = st.secrets["AWS"].get("REGION", "eu-west-1")
-            # st.info("📝 Using credentials from Streamlit secrets (local development)")
-        except (KeyError, AttributeError):
-            # secrets not available either
-            aws_access_key = None
-            aws_secret_key = None
-            st.warning("🔐 No AWS credentials found in environment variables or secrets")
-    else:
-        st.info("☁️ Using credentials from environment variables (Vercel production)")
-    
-    return aws_access_key, aws_secret_key, aws_region
-
-
-def call_api(json_payload,api_url):
+def call_api(json_payload,api_url,use_cache=True,projection=True):
     """
     call api function 
+    FillScore and Proj responses are served from the disk cache unless use_cache=False
+    the payload is reduced to PROJECTIONS[api_url] when enabled (KLEMO_PROJECTION=1)
+    identical FillScore calls already in flight are shared instead of sent again
     """
+    debut = time.perf_counter()
+    endpoint = nom_endpoint(api_url)
+    if projection and API_PROJECTION and api_url in PROJECTIONS:
+        json_payload = projeter(json_payload, PROJECTIONS[api_url])
+    cle = cle_cache(api_url, json_payload)
+    cacheable = use_cache and api_cache is not None and api_url in CACHE_ENDPOINTS
+    if cacheable:
+        reponse = api_cache.get(cle)
+        if reponse is not None:
+            enregistrer(f"{endpoint} [cache]", wall=time.perf_counter() - debut)
+            return reponse, round(time.perf_counter() - debut, 2)
     try:
         payload_ini = json.dumps({"data_ctxt":json_payload})
         # st.write(f"Calling API at {api_url} with payload: {payload_ini[:40]}...")  # Debugging information
-        response = requests.post(api_url, data = payload_ini, auth = auth)
+        # seuls les endpoints sans état serveur sont partagés entre appelants
+        response = api_client.post(api_url, data = payload_ini,
+                                   cle = cle if api_url in COALESCENCE_ENDPOINTS else None)
         response.raise_for_status()  # Raise an error for bad responses
         # if 'output' in response.json().keys():
         #     st.write(f"API Response having following keys: {list(response.json()['output'].keys())[-4:]}...")
-        return response.json(), round(response.elapsed.total_seconds(),2)# Assuming the API returns JSON response
-    except requests.exceptions.RequestException as e:
+        reponse = response.json()
+        if response.coalesce:
+            # l'appel partagé est déjà compté (et mis en cache) par son premier appelant
+            enregistrer(f"{endpoint} [coalescé]", wall=time.perf_counter() - debut)
+            return reponse, round(response.elapsed.total_seconds(),2)
+        enregistrer(endpoint, wall=time.perf_counter() - debut, serveur=response.elapsed.total_seconds(),
+                    retries=nb_retries(response), en_vol=response.en_vol, **mesures_octets(response))
+        if cacheable:
+            api_cache.put(cle, reponse)
+        return reponse, round(response.elapsed.total_seconds(),2)# Assuming the API returns JSON response
+    except (requests.exceptions.RequestException, IdentifiantsAWSManquants) as e:
         print(f"Error calling the API: {e}")
+        enregistrer(f"{endpoint} [erreur]", wall=time.perf_counter() - debut)
         return None,None
 
 # polling result 
-def poll_result(api_url, request_id):
+# calendrier de polling de strat_result (secondes) : premier contrôle rapide, puis
+# intervalle multiplié par `facteur` à chaque 202 (± jitter), plafonné à `max`,
+# et abandon après `deadline`
+POLL_SCHEDULE = {
+    "premier":  0.25,
+    "facteur":  1.6,
+    "max":      5.0,
+    "jitter":   0.2,
+    "deadline": 180.0
+}
+
+def poll_result(api_url, request_id, schedule=None):
+    """
+    poll strat_result until 200, error or deadline.
+    The returned response carries poll_count and time_to_result (seconds).
+    """
+    schedule = {**POLL_SCHEDULE, **(schedule or {})}
+    debut = time.monotonic()
+    intervalle = schedule["premier"]
+    poll_count = 0
     while True:
-        response = requests.get(f"{api_url}/strat_result/{request_id}",auth = auth)
-        if response.status_code == 200:
-            print("Result:", response.json()['output'])
-            return response
-            break
-        elif response.status_code == 202:
-            print("Processing... retrying in 5 seconds")
-            time.sleep(5)
-        else:
-            print("Error:", response.text)
-            break
+        restant = schedule["deadline"] - (time.monotonic() - debut)
+        if restant <= 0:
+            print(f"Timeout: no strat result after {poll_count} polls in {schedule['deadline']} seconds")
+            return None
+        time.sleep(min(intervalle * random.uniform(1 - schedule["jitter"], 1 + schedule["jitter"]), restant))
+        debut_get = time.perf_counter()
+        try:
+            response = api_client.get(f"{api_url}/strat_result/{request_id}")
+            poll_count += 1
+            enregistrer("strat_result", wall=time.perf_counter() - debut_get, serveur=response.elapsed.total_seconds(),
+                        retries=nb_retries(response), **mesures_octets(response))
+            if response.status_code == 200:
+                response.poll_count = poll_count
+                response.time_to_result = round(time.monotonic() - debut, 2)
+                print(f"Result after {poll_count} polls in {response.time_to_result} seconds:", response.json()['output'])
+                enregistrer("strat_result [polling]", wall=time.monotonic() - debut, polls=poll_count)
+                return response
+            elif response.status_code == 202:
+                intervalle = min(max(intervalle, 0.1) * schedule["facteur"], schedule["max"])
+                print(f"Processing... retrying in {round(intervalle, 2)} seconds")
+            else:
+                print("Error:", response.text)
+                return None
+        except (requests.exceptions.RequestException, IdentifiantsAWSManquants, ValueError, KeyError) as e:
+            print(f"Error polling strat_result: {e}")
+            enregistrer("strat_result [erreur]", wall=time.perf_counter() - debut_get)
+            return None
 
 
 def load_base_info(name_json):
@@ -74,27 +112,64 @@ def load_base_info(name_json):
         return json.load(f)
 
 
-aws_access_key, aws_secret_key, aws_region = get_aws_credentials()
-session     = boto3.Session(aws_access_key_id=aws_access_key,
-                            aws_secret_access_key=aws_secret_key,
-                            region_name = aws_region)
-
-credentials = session.get_credentials()
-
-auth = AWS4Auth(
-    credentials.access_key,
-    credentials.secret_key,
-    aws_region,
-    'execute-api',
-    session_token=credentials.token
-)
-
 ##### test nom du domaine ####
-FILL_SCORE_URL   = "https://algo.yde.core.techklemo.com/v1/fill-score"
-PROJ_URL         = "https://algo.yde.core.techklemo.com/v1/proj"
-STRAT_URL        = "https://algo.yde.core.techklemo.com/v1"
-SOUSCRIPTION_URL = "https://algo.yde.core.techklemo.com/v1/souscription"
+# KLEMO_API_BASE=http://127.0.0.1:8765/v1 pour viser le serveur simulé (helpers.mock_server)
+API_BASE_URL     = os.getenv("KLEMO_API_BASE", "https://algo.yde.core.techklemo.com/v1").rstrip("/")
+
+# signature SigV4 paresseuse, partagée par tout le processus (helpers.aws_credentials) ;
+# le serveur simulé ne vérifie pas de signature : rien n'est signé vers un hôte local,
+# aucun identifiant AWS n'est alors nécessaire
+HOTES_LOCAUX = ("127.0.0.1", "localhost", "::1")
+API_LOCALE   = urlparse(API_BASE_URL).hostname in HOTES_LOCAUX
+auth = None if API_LOCALE else AUTH_AWS
+FILL_SCORE_URL   = f"{API_BASE_URL}/fill-score"
+PROJ_URL         = f"{API_BASE_URL}/proj"
+STRAT_URL        = API_BASE_URL
+SOUSCRIPTION_URL = f"{API_BASE_URL}/souscription"
 STRAT_INIT_URL   = f"{STRAT_URL}/strat_init"
+STRAT_RESULT_URL = f"{STRAT_URL}/strat_result"
+
+# (connexion, lecture) en secondes par endpoint
+API_TIMEOUTS = {
+    FILL_SCORE_URL:   (5, 60),
+    PROJ_URL:         (5, 120),
+    STRAT_INIT_URL:   (5, 30),
+    STRAT_RESULT_URL: (5, 30),
+    SOUSCRIPTION_URL: (5, 60)
+}
+
+# client HTTP partagé : connexions keep-alive poolées, relance sur 5xx/429,
+# corps de requête en gzip si KLEMO_GZIP=1, appels identiques simultanés aux
+# COALESCENCE_ENDPOINTS dédupliqués sauf si KLEMO_COALESCENCE=0
+API_GZIP   = os.getenv("KLEMO_GZIP", "0") == "1"
+API_COALESCENCE = os.getenv("KLEMO_COALESCENCE", "1") != "0"
+api_client = KlemoApiClient(auth, timeouts=API_TIMEOUTS, compression=API_GZIP, coalescence=API_COALESCENCE)
+# endpoints dont un appel peut être partagé : FillScore seulement. Chaque Proj range
+# son résultat côté serveur sous un requestId propre, que les StratInit / strat_result
+# de la session réutilisent ; partagé entre deux sessions, leurs strats s'écraseraient.
+COALESCENCE_ENDPOINTS = (FILL_SCORE_URL,)
+
+def nom_endpoint(api_url):
+    """'fill-score', 'proj', 'strat_init', ... : libellé des métriques de latence."""
+    chemin = api_url[len(API_BASE_URL):] if api_url.startswith(API_BASE_URL) else api_url
+    return chemin.strip("/").split("/")[0]
+
+# sections et champs envoyés par endpoint (helpers.projection), appliqués si
+# KLEMO_PROJECTION=1. Désactivé par défaut tant qu'un passage contre des références
+# enregistrées de l'API réelle n'est pas concluant :
+#   python -m helpers.projection json/t*.json --enregistrements refs/ --enregistrer  (enregistre)
+#   python -m helpers.projection json/t*.json --enregistrements refs/                (valide, code 0)
+PROJECTIONS = {
+    PROJ_URL: PROJECTION_PROJ
+}
+API_PROJECTION = os.getenv("KLEMO_PROJECTION", "0") == "1"
+
+# réponses déterministes mises en cache disque (KLEMO_CACHE=0 pour désactiver).
+# Pas Proj : sa réponse porte le requestId / requestKey du résultat rangé côté serveur,
+# qu'une StratInit ultérieure doit retrouver ; rejoués depuis le cache, ils peuvent
+# désigner un résultat expiré ou celui d'une autre session.
+CACHE_ENDPOINTS = (FILL_SCORE_URL,)
+api_cache = ReponseCache() if os.getenv("KLEMO_CACHE", "1") != "0" else None
 
 OBJECTIF_CHOICES = {
     "Investir" : ["Investir régulièrement", "Investir dans ma résidence principale", "Investir dans de l'immobilier locatif", "Optimiser la rentabilité et les risques de mes actifs financiers"],
@@ -120,6 +195,7 @@ MAPPINGS_OBJECTIF_CHOICES = {
     "Limiter la fiscalité sur les revenus":"fiscalite_revenus"}
 
 
+@chrono("rendu display_bilan_synth")
 def display_bilan_synth(json_synth):
 
     pat_synth = json_synth["output"]["patSynth"]
@@ -424,6 +500,7 @@ def display_bilan_synth(json_synth):
 
 
 
+@chrono("rendu display_strat_output")
 def display_strat_output(obj, ssobj, payload_strat, strat_output,debut=0):
     with st.container():
         st.markdown("**ℹ️ Détails de l'Objectif Client**")
@@ -563,4 +640,40 @@ def display_strat_output(obj, ssobj, payload_strat, strat_output,debut=0):
         # st.dataframe(pd.DataFrame(best_element["variantesResult"][bestIndex]["metriques"][best_element["attribut"]['metrique2']['name']])[["index","horizon","pct5","pct50","pct95"]].head(10))
         with st.expander("🧐 Coût et frais de la recommandation" , expanded =True):
             lastCost = best_element["variantesResult"][bestIndex]["metriques"]["difCout"][-1]
-            st.write(f"Coût et frais: A l'horizon de {lastCost['horizon']} ans, l'ensemble des coûts et de frais associés s'élève à  {lastCost['CoutsFraisTotal']} € (soit {round(lastCost['PctCoutsFraisTotal']*100,0)}%)")
\ No newline at end of file
+            st.write(f"Coût et frais: A l'horizon de {lastCost['horizon']} ans, l'ensemble des coûts et de frais associés s'élève à  {lastCost['CoutsFraisTotal']} € (soit {round(lastCost['PctCoutsFraisTotal']*100,0)}%)")
+
+STATUTS_COMPARAISON = {"ok": "✅", "erreur": "❌", "en_cours": "⏳"}
+
+@chrono("rendu display_comparaison_objectifs")
+def display_comparaison_objectifs(grille):
+    """Grille de comparaison des objectifs (une ligne par paire), remplie au fil des résultats."""
+    lignes = []
+    for resultat in grille:
+        ligne = {
+            "Objectif": resultat["objectif"],
+            "Objectif Détaillé": resultat["sousObjectif"],
+            "Statut": STATUTS_COMPARAISON.get(resultat["statut"], resultat["statut"]),
+            "Meilleure Recommendation": None,
+            "Métrique 1": None,
+            "Métrique 2": None,
+            "Nb Recos": None,
+            "Temps (s)": resultat.get("time_to_result")
+        }
+        strat_output = resultat.get("output")
+        if strat_output:
+            best_element = next((strat_ele for strat_ele in strat_output if strat_ele["attribut"]["prioGlobal"] == 0),
+                                strat_output[0])
+            bestIndex = best_element["attribut"]["bestVarIndex"]
+            ligne["Meilleure Recommendation"] = best_element["variantesResult"][bestIndex]["metriques"]["libVariante"]
+            for k in (1, 2):
+                metrique = best_element["attribut"][f"metrique{k}"]
+                ligne[f"Métrique {k}"] = f"{metrique['libelle']} : {metrique['value']} €"
+            ligne["Nb Recos"] = len(strat_output)
+        elif resultat["statut"] == "ok":
+            ligne["Meilleure Recommendation"] = "Pas de recommendations valides."
+        elif resultat["statut"] == "erreur":
+            ligne["Meilleure Recommendation"] = f"échec à l'étape {resultat.get('etape')}"
+        lignes.append(ligne)
+    termines = sum(resultat["statut"] != "en_cours" for resultat in grille)
+    st.subheader(f"📊 Comparaison des objectifs ({termines}/{len(grille)})")
+    st.dataframe(pd.DataFrame(lignes), use_container_width=True, hide_index=True)
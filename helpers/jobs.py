@@ -0,0 +1,307 @@
+import time
+import uuid
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import json
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from helpers import func
+from helpers import store
+from helpers.pipeline import id_poll, paires_objectifs, run_objectifs, verrou_strat
+
+
+################################
+##### JOBS EN ARRIERE-PLAN ####
+################################
+# Les chaînes d'appels API (FillScore -> Proj, StratInit -> strat_result) tournent
+# dans un pool de threads partagé par tout le processus et non dans le thread de
+# script Streamlit. Une page soumet un job, garde son id dans st.session_state et
+# relit son état à chaque rerun (suivre_job) ; le résultat d'un job terminé
+# attend dans le registre jusqu'à ce que la session le récupère.
+
+NB_WORKERS_JOBS = 8
+# un job terminé et jamais récupéré (onglet fermé) est oublié après ce délai (secondes)
+TTL_JOBS = 3600
+# intervalle de rafraîchissement d'une page qui attend un job (secondes)
+INTERVALLE_SUIVI = 0.5
+
+EN_ATTENTE, EN_COURS, TERMINE, ERREUR = "en_attente", "en_cours", "termine", "erreur"
+
+
+class Job:
+
+    def __init__(self, nom):
+        self.id = uuid.uuid4().hex
+        self.nom = nom
+        self.etat = EN_ATTENTE
+        self.etape = None
+        self.progression = 0.0
+        self.resultat = None
+        # résultat partiel publié par le job en cours de route (None si le job n'en publie pas)
+        self.partiel = None
+        self.erreur = None
+        self.soumis = time.time()
+        self.fin = None
+
+    def avancer(self, etape, progression):
+        """Appelé par la fonction du job pour publier son avancement (progression entre 0 et 1)."""
+        self.etape = etape
+        self.progression = progression
+
+    @property
+    def fini(self):
+        return self.etat in (TERMINE, ERREUR)
+
+
+class ExecuteurJobs:
+    """Pool de workers et registre des jobs {id: Job}, partagés par toutes les sessions."""
+
+    def __init__(self, max_workers=NB_WORKERS_JOBS, ttl=TTL_JOBS):
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._jobs = {}
+
+    def soumettre(self, fn, *args, nom=None, **kwargs):
+        """Lance fn(job, *args, **kwargs) en arrière-plan et renvoie l'id du job."""
+        job = Job(nom or fn.__name__)
+        with self._lock:
+            self._purger()
+            self._jobs[job.id] = job
+        # le contexte de la session soumettrice suit le job (métriques de session)
+        self._executor.submit(self._executer, job, fn, args, kwargs, get_script_run_ctx())
+        return job.id
+
+    def _executer(self, job, fn, args, kwargs, ctx):
+        add_script_run_ctx(threading.current_thread(), ctx)
+        job.etat = EN_COURS
+        try:
+            job.resultat = fn(job, *args, **kwargs)
+            job.progression = 1.0
+            job.etat = TERMINE
+        except Exception as e:
+            print(f"Error in job {job.nom} ({job.id}): {e}")
+            job.erreur = str(e)
+            job.etat = ERREUR
+        finally:
+            job.fin = time.time()
+            add_script_run_ctx(threading.current_thread(), None)
+
+    def etat(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def recuperer(self, job_id):
+        """Job terminé retiré du registre (None s'il est inconnu ou encore en cours)."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or not job.fini:
+                return None
+            return self._jobs.pop(job_id)
+
+    def _purger(self):
+        limite = time.time() - self.ttl
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.fini and job.fin < limite]:
+            del self._jobs[job_id]
+
+
+# pool unique du processus
+JOBS = ExecuteurJobs()
+
+
+def job_fill_score(job, base):
+    """FillScore seul : {'json_proj', 'temps'}."""
+    job.avancer("fill_score", 0.1)
+    json_proj, temps = func.call_api(base, func.FILL_SCORE_URL)
+    if not json_proj:
+        raise RuntimeError("FillScore n'a pas répondu")
+    return {"json_proj": json_proj["output"], "temps": temps}
+
+
+def job_proj(job, json_proj):
+    """Proj seul, sur une sortie FillScore : {'json_proj', 'json_synth'} comme job_bilan."""
+    job.avancer("proj", 0.5)
+    json_synth, _ = func.call_api(json_proj, func.PROJ_URL)
+    if not json_synth:
+        raise RuntimeError("Proj n'a pas répondu")
+    return {"json_proj": json_proj, "json_synth": json_synth}
+
+
+def job_bilan(job, base):
+    """FillScore puis Proj : {'json_proj', 'json_synth'} comme attendu par les pages."""
+    return job_proj(job, job_fill_score(job, base)["json_proj"])
+
+
+def job_strat(job, payload_strat, objectif=None, sous_objectif=None):
+    """StratInit puis polling de strat_result : {'objectif', 'sous_objectif', 'output'}."""
+    # une autre strat sur le même Proj (autre job, autre session) passe d'abord
+    job.avancer("en attente d'une autre strat sur ce bilan", 0.0)
+    with verrou_strat(payload_strat["requestId"]):
+        job.avancer("strat_init", 0.1)
+        init_strat, _ = func.call_api(payload_strat, func.STRAT_INIT_URL)
+        if not init_strat:
+            raise RuntimeError("StratInit n'a pas répondu")
+        job.avancer("strat_result", 0.3)
+        strat_result = func.poll_result(func.STRAT_URL, id_poll(init_strat, payload_strat))
+    if strat_result is None:
+        raise RuntimeError("pas de résultat strat (erreur ou délai dépassé)")
+    return {"objectif": objectif, "sous_objectif": sous_objectif, "output": strat_result.json()["output"]}
+
+
+def job_objectifs(job, payload_strat, paires=None):
+    """
+    StratInit + strat_result pour toutes les paires (objectif, sous-objectif), l'une
+    après l'autre, sur le résultat Proj de payload_strat. job.partiel est la grille en cours de
+    remplissage : une ligne par paire, 'en_cours' jusqu'à son résultat.
+    """
+    paires = paires_objectifs() if paires is None else list(paires)
+    grille = [{"rang": rang, "objectif": objectif, "sousObjectif": sous_objectif, "statut": EN_COURS}
+              for rang, (objectif, sous_objectif) in enumerate(paires)]
+    job.partiel = grille
+    job.avancer(f"0/{len(paires)} objectifs", 0.0)
+
+    async def collecter():
+        n = 0
+        async for resultat in run_objectifs(payload_strat, paires):
+            grille[resultat["rang"]] = resultat
+            n += 1
+            job.avancer(f"{n}/{len(paires)} objectifs", n / len(paires))
+
+    asyncio.run(collecter())
+    return grille
+
+
+def soumettre(cle, fn, *args, **kwargs):
+    """Soumet un job et range son id dans st.session_state[cle] (un job précédent est abandonné)."""
+    st.session_state[cle] = JOBS.soumettre(fn, *args, **kwargs)
+
+
+def job_en_cours(cle):
+    """Le job st.session_state[cle] tourne-t-il encore ?"""
+    job_id = st.session_state.get(cle)
+    job = JOBS.etat(job_id) if job_id is not None else None
+    return job is not None and not job.fini
+
+
+def suivre_job(cle, partiel=False):
+    """
+    Avancement du job st.session_state[cle] : barre de progression tant qu'il tourne,
+    message d'erreur s'il échoue. Renvoie son résultat une seule fois, au rerun où il
+    est récupéré, sinon None (ou, avec partiel=True, son résultat partiel tant qu'il tourne).
+    """
+    job_id = st.session_state.get(cle)
+    if job_id is None:
+        return None
+    job = JOBS.etat(job_id)
+    if job is None:
+        del st.session_state[cle]
+        return None
+    if not job.fini:
+        st.progress(job.progression, text=f"⏳ {job.etape or 'en attente'}…")
+        return list(job.partiel) if partiel and job.partiel is not None else None
+    JOBS.recuperer(job_id)
+    del st.session_state[cle]
+    if job.etat == ERREUR:
+        st.error(f"❌ {job.erreur}")
+        return None
+    return job.resultat
+
+
+def rafraichir_jobs(*cles):
+    """À appeler en fin de page : relance le script tant qu'un des jobs suivis tourne."""
+    for cle in cles:
+        job_id = st.session_state.get(cle)
+        job = JOBS.etat(job_id) if job_id is not None else None
+        if job is not None:
+            time.sleep(INTERVALLE_SUIVI)
+            st.rerun()
+
+
+################################
+##### SECTIONS DES PAGES ####
+################################
+# Bilan et recos des pages UserTest / Reco : seuls la base du persona, le formulaire
+# objectif et le profil investisseur changent d'une page à l'autre. Les résultats
+# affichés sont rangés dans helpers.store : ils restent à l'écran pendant les reruns
+# de rafraichir_jobs.
+
+def section_bilan(base, fn=job_bilan, bouton="LANCER LA SIMULATION KLEMO"):
+    """
+    Bouton de simulation, suivi du job FillScore -> Proj et affichage du bilan. fn=job_proj
+    part d'une sortie FillScore déjà obtenue (base est alors le json_proj).
+    """
+    if st.button(bouton):
+        st.session_state.simulation_ready = False
+        soumettre("job_bilan", fn, base)
+
+    bilan = suivre_job("job_bilan")
+    if bilan is not None:
+        # la session ne garde que les clés des résultats (helpers.store)
+        store.garder("json_proj", bilan["json_proj"])
+        store.garder("json_synth", bilan["json_synth"])
+        st.session_state.json_synth_id = bilan["json_synth"]["requestId"]
+        st.session_state.json_synth_key = bilan["json_synth"]["requestKey"]
+        st.session_state.simulation_ready = True
+        st.success("✅ Simulation Bilan exécutée avec succès !")
+
+    if st.session_state.get("simulation_ready"):
+        json_synth = store.reprendre("json_synth")
+        if json_synth is not None:
+            func.display_bilan_synth(json_synth)
+        else:
+            st.warning("⌛ Bilan expiré côté serveur : relancez la simulation.")
+    else:
+        st.info(f"👉 Cliquez sur **{bouton}** pour commencer.")
+
+
+def section_recos(param_objectif, investor_profile, objectif, sous_objectif, debut=5):
+    """
+    Boutons reco / comparaison de tous les objectifs sous le formulaire objectif,
+    suivi des jobs et affichage des résultats. À appeler en fin de page : relance le
+    script tant qu'un job de la page tourne.
+    """
+    request_id = st.session_state.get("json_synth_id")
+
+    # une strat à la fois par Proj (verrou_strat) : boutons grisés tant qu'une tourne
+    strat_en_cours = job_en_cours("job_strat") or job_en_cours("job_objectifs")
+    col_reco, col_objectifs = st.columns(2)
+    lancer_reco = col_reco.button("LANCER SIMULATION RECOS KLEMO", disabled=strat_en_cours)
+    # strat de toutes les paires (objectif, sous-objectif) sur le même Proj
+    lancer_objectifs = col_objectifs.button("COMPARER TOUS LES OBJECTIFS", disabled=strat_en_cours)
+    if lancer_reco or lancer_objectifs:
+        st.session_state.payload_strat = {
+            "requestId": request_id,
+            "requestKey": st.session_state.get("json_synth_key"),
+            "objectif": func.MAPPINGS_OBJECTIF_CHOICES[objectif],
+            "sousObjectif": func.MAPPINGS_OBJECTIF_CHOICES[sous_objectif],
+            "paramObjectif": json.loads(param_objectif),
+            "investorProfile": investor_profile
+        }
+        if request_id:
+            if lancer_objectifs:
+                store.garder("comparaison_objectifs", None)
+                soumettre("job_objectifs", job_objectifs, st.session_state.payload_strat)
+            else:
+                store.garder("reco_strat", None)
+                soumettre("job_strat", job_strat, st.session_state.payload_strat, objectif, sous_objectif)
+
+    reco = suivre_job("job_strat")
+    if reco is not None:
+        store.garder("reco_strat", {**reco, "payload_strat": st.session_state.payload_strat})
+    reco = store.reprendre("reco_strat")
+    if reco is not None:
+        func.display_strat_output(reco["objectif"], reco["sous_objectif"], reco["payload_strat"], reco["output"], debut)
+
+    comparaison = suivre_job("job_objectifs", partiel=True)
+    if comparaison is not None and "job_objectifs" not in st.session_state:
+        # job récupéré : grille complète
+        store.garder("comparaison_objectifs", comparaison)
+    comparaison = comparaison or store.reprendre("comparaison_objectifs")
+    if comparaison:
+        func.display_comparaison_objectifs(comparaison)
+
+    # rerun tant qu'un job de la page tourne
+    rafraichir_jobs("job_bilan", "job_strat", "job_objectifs")
@@ -0,0 +1,171 @@
+import sys
+import csv
+import json
+import time
+import random
+import asyncio
+import contextlib
+import argparse
+import itertools
+from collections import Counter
+
+import numpy as np
+
+from helpers import func
+from helpers.api_client import KlemoApiClient
+from helpers.payload_stream import GABARIT_PAYLOAD, generer_payloads
+from helpers.pipeline import ETAPES, Pipeline, lire_payloads, paires_objectifs
+
+
+################################
+##### TEST DE CHARGE ####
+################################
+# Pousse des personas à travers FillScore -> Proj -> StratInit -> strat_result, soit
+# en boucle fermée (concurrence fixe : N personas en vol en permanence), soit en
+# boucle ouverte (arrivées de Poisson à un débit cible, sans attendre les réponses).
+# Les objectifs tournent sur toutes les paires (objectif, sous-objectif) de
+# func.OBJECTIF_CHOICES. Vise l'API réelle ou le serveur simulé via KLEMO_API_BASE.
+#
+# Exemples :
+#   python -m helpers.loadtest -n 200 --seed 1 --concurrence 16 --json rapport.json --csv rapport.csv
+#   python -m helpers.loadtest -n 600 --debit 5 --payloads 'json/t*.json'
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def _stats(valeurs):
+    if not valeurs:
+        return {"n": 0}
+    valeurs = np.asarray(valeurs, dtype=float)
+    stats = {"n": int(valeurs.size), "moyenne": round(float(valeurs.mean()), 3)}
+    stats.update({f"p{q}": round(float(np.percentile(valeurs, q)), 3) for q in PERCENTILES})
+    stats["max"] = round(float(valeurs.max()), 3)
+    return stats
+
+
+def rapport(resultats, duree_totale, mode):
+    """Débit, percentiles de latence par étape et répartition des erreurs."""
+    ok = [r for r in resultats if r["statut"] == "ok"]
+    etapes = {etape: _stats([r["durees"][etape] for r in ok]) for etape in ETAPES}
+    etapes["total"] = _stats([r["duree"] for r in ok])
+    erreurs = Counter(r["etape"] for r in resultats if r["statut"] != "ok")
+    par_objectif = {}
+    for r in resultats:
+        cle = f"{r['objectif']} / {r['sousObjectif']}"
+        ligne = par_objectif.setdefault(cle, {"n": 0, "ok": 0})
+        ligne["n"] += 1
+        ligne["ok"] += r["statut"] == "ok"
+    return {
+        "mode": mode,
+        "personas": len(resultats),
+        "ok": len(ok),
+        "erreurs": len(resultats) - len(ok),
+        "duree_s": round(duree_totale, 3),
+        "debit_ok_par_min": round(60 * len(ok) / duree_totale, 2) if duree_totale else None,
+        "latences_s": etapes,
+        "polls": _stats([r["poll_count"] for r in ok]),
+        "erreurs_par_etape": {etape: erreurs.get(etape, 0) for etape in ETAPES},
+        "par_objectif": par_objectif
+    }
+
+
+async def charge(payloads, concurrence=None, debit=None, max_en_vol=256, seed=None, **kwargs_pipeline):
+    """
+    Résultats du pipeline pour chaque payload, en boucle fermée (concurrence) ou
+    ouverte (debit, en personas par seconde). kwargs_pipeline est passé à Pipeline.
+    """
+    rng = random.Random(seed)
+    objectifs = itertools.cycle(paires_objectifs())
+    limite = concurrence or max_en_vol
+    pipeline = Pipeline(concurrency=limite, **kwargs_pipeline)
+    entrees = ((i, base, *next(objectifs)) for i, base in enumerate(payloads))
+    resultats = []
+    try:
+        if debit is None:
+            async def travailleur():
+                for nom, base, objectif, sous_objectif in entrees:
+                    resultats.append(await pipeline.run(nom, base, objectif, sous_objectif))
+            await asyncio.gather(*(travailleur() for _ in range(limite)))
+        else:
+            # au-delà de max_en_vol personas en cours, les arrivées attendent un slot
+            en_vol = asyncio.Semaphore(max_en_vol)
+
+            async def arrivee(nom, base, objectif, sous_objectif):
+                async with en_vol:
+                    resultats.append(await pipeline.run(nom, base, objectif, sous_objectif))
+            taches = []
+            prochaine = time.monotonic()
+            for entree in entrees:
+                await asyncio.sleep(max(0.0, prochaine - time.monotonic()))
+                taches.append(asyncio.create_task(arrivee(*entree)))
+                prochaine += rng.expovariate(debit)
+            await asyncio.gather(*taches)
+    finally:
+        pipeline.executor.shutdown(wait=False, cancel_futures=True)
+    return resultats
+
+
+def ecrire_csv(rapport_charge, fichier):
+    """Une ligne par étape (et 'total') : n, percentiles, erreurs."""
+    colonnes = ["etape", "n", "moyenne"] + [f"p{q}" for q in PERCENTILES] + ["max", "erreurs"]
+    with open(fichier, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=colonnes, extrasaction="ignore")
+        writer.writeheader()
+        for etape, stats in rapport_charge["latences_s"].items():
+            writer.writerow({"etape": etape, **stats,
+                             "erreurs": rapport_charge["erreurs_par_etape"].get(etape, rapport_charge["erreurs"])})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Test de charge du pipeline FillScore -> Proj -> Strat.")
+    parser.add_argument("-n", "--nombre", type=int, required=True, help="nombre de personas")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--seed", type=int, default=0, help="graine des personas simulés")
+    source.add_argument("--payloads", nargs="+", help="fichiers JSON (glob) ou NDJSON, répétés jusqu'à n")
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--concurrence", type=int, help="personas en vol en permanence (boucle fermée)")
+    mode.add_argument("--debit", type=float, help="arrivées par seconde (boucle ouverte, Poisson)")
+    parser.add_argument("--max-en-vol", type=int, default=256, help="plafond de personas en cours (boucle ouverte)")
+    parser.add_argument("--gabarit", default=GABARIT_PAYLOAD)
+    parser.add_argument("--cache", action="store_true", help="autorise le cache disque des réponses FillScore (func.CACHE_ENDPOINTS)")
+    parser.add_argument("--json", help="rapport JSON (stdout par défaut)")
+    parser.add_argument("--csv", help="rapport CSV par étape")
+    args = parser.parse_args(argv)
+
+    if args.payloads:
+        bases = [base for _, base in lire_payloads(args.payloads)]
+        if not bases:
+            parser.error("aucun payload trouvé")
+        payloads = list(itertools.islice(itertools.cycle(bases), args.nombre))
+    else:
+        # générés avant le chronomètre pour ne mesurer que le pipeline
+        payloads = list(generer_payloads(args.nombre, args.seed, gabarit=args.gabarit))
+
+    # un pool de connexions à la taille de la charge, sinon il plafonne la concurrence ;
+    # sans coalescence : chaque persona envoie ses propres requêtes, même à payload identique
+    pool = 4 * (args.concurrence or args.max_en_vol)
+    func.api_client = KlemoApiClient(func.auth, timeouts=func.API_TIMEOUTS, pool_maxsize=pool,
+                                     compression=func.API_GZIP, coalescence=False)
+
+    debut = time.monotonic()
+    # les traces de call_api partent sur stderr : stdout est réservé au rapport
+    with contextlib.redirect_stdout(sys.stderr):
+        resultats = asyncio.run(charge(payloads, concurrence=args.concurrence, debit=args.debit,
+                                       max_en_vol=args.max_en_vol, seed=args.seed, use_cache=args.cache))
+    mode = f"concurrence={args.concurrence}" if args.concurrence else f"debit={args.debit}/s"
+    rapport_charge = rapport(resultats, time.monotonic() - debut, mode)
+
+    texte = json.dumps(rapport_charge, ensure_ascii=False, indent=2)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            f.write(texte)
+    else:
+        print(texte)
+    if args.csv:
+        ecrire_csv(rapport_charge, args.csv)
+    print(f"{rapport_charge['ok']}/{rapport_charge['personas']} ok, "
+          f"{rapport_charge['debit_ok_par_min']} personas/min", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
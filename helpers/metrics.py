@@ -0,0 +1,211 @@
+import math
+import time
+import threading
+import functools
+import contextvars
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+
+################################
+##### METRIQUES DE LATENCE ####
+################################
+# Histogrammes à buckets logarithmiques (style HDR : erreur relative bornée par
+# `precision`, mémoire indépendante du nombre de mesures) par endpoint et par mesure :
+#   wall        temps mur côté client (envoi, attente, décodage JSON / rendu)
+#   serveur     temps jusqu'aux en-têtes de réponse (response.elapsed)
+#   octets_env  taille du corps envoyé (avant compression)
+#   octets_rec  taille du corps reçu (après décompression)
+#   fil_env / fil_rec  mêmes tailles sur le fil (gzip compris)
+#   retries     relances effectuées par le client HTTP
+#   polls       nombre de GET strat_result avant le résultat
+#   en_vol      appels distincts en vol au moment de l'envoi (client HTTP partagé)
+# Un appel servi par un appel identique déjà en vol est compté sous "<endpoint> [coalescé]".
+# Deux portées : le processus (toutes sessions, pipeline compris) et la session
+# Streamlit courante (st.session_state). Les jobs (helpers.jobs) portent le contexte
+# de leur session ; les threads du Pipeline n'en ont pas et reçoivent les métriques
+# de la session qui a lancé l'appel par lier_session.
+
+PERCENTILES = (50, 95, 99)
+
+# plus petite valeur distinguée de 0, par mesure
+PLANCHERS = {
+    "wall":       1e-4,
+    "serveur":    1e-4,
+    "octets_env": 1,
+    "octets_rec": 1,
+    "fil_env":    1,
+    "fil_rec":    1,
+    "retries":    1,
+    "polls":      1,
+    "en_vol":     1
+}
+
+
+class Histogramme:
+
+    def __init__(self, precision=0.01, plancher=1e-4):
+        self.precision = precision
+        self.plancher = plancher
+        self._log = math.log1p(precision)
+        self.compteurs = {}
+        self.n = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def ajouter(self, valeur):
+        i = -1 if valeur < self.plancher else int(math.log(valeur / self.plancher) / self._log)
+        self.compteurs[i] = self.compteurs.get(i, 0) + 1
+        self.n += 1
+        self.total += valeur
+        self.min = min(self.min, valeur)
+        self.max = max(self.max, valeur)
+
+    def percentile(self, q):
+        if not self.n:
+            return None
+        rang = math.ceil(q / 100 * self.n)
+        cumul = 0
+        for i in sorted(self.compteurs):
+            cumul += self.compteurs[i]
+            if cumul >= rang:
+                if i < 0:
+                    return 0.0
+                # milieu du bucket, borné par les extrêmes observés
+                return min(max(self.plancher * (1 + self.precision) ** (i + 0.5), self.min), self.max)
+        return self.max
+
+
+class Metriques:
+    """Registre thread-safe {(endpoint, mesure): Histogramme}."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histogrammes = {}
+        self.debut = time.time()
+
+    def enregistrer(self, endpoint, **mesures):
+        with self._lock:
+            for mesure, valeur in mesures.items():
+                if valeur is None:
+                    continue
+                cle = (endpoint, mesure)
+                if cle not in self.histogrammes:
+                    self.histogrammes[cle] = Histogramme(plancher=PLANCHERS.get(mesure, 1e-4))
+                self.histogrammes[cle].ajouter(valeur)
+
+    def resume(self):
+        """Une ligne par (endpoint, mesure) : n, moyenne, p50 / p95 / p99, max."""
+        with self._lock:
+            lignes = []
+            for (endpoint, mesure), h in sorted(self.histogrammes.items()):
+                ligne = {"endpoint": endpoint, "mesure": mesure, "n": h.n, "moyenne": h.total / h.n}
+                ligne.update({f"p{q}": h.percentile(q) for q in PERCENTILES})
+                ligne["max"] = h.max
+                lignes.append(ligne)
+            return lignes
+
+    def reset(self):
+        with self._lock:
+            self.histogrammes = {}
+            self.debut = time.time()
+
+
+# portée processus : partagée par toutes les sessions
+METRIQUES_PROCESSUS = Metriques()
+# métriques de session liées à un thread de fond par lier_session
+_METRIQUES_LIEES = contextvars.ContextVar("metriques_session", default=None)
+
+
+def metriques_session():
+    """Métriques de la session Streamlit courante, ou None hors d'un script Streamlit."""
+    liees = _METRIQUES_LIEES.get()
+    if liees is not None:
+        return liees
+    # thread de fond sans session liée : pas de session, et pas d'avertissement
+    if get_script_run_ctx(suppress_warning=True) is None:
+        return None
+    if "metriques_latence" not in st.session_state:
+        st.session_state.metriques_latence = Metriques()
+    return st.session_state.metriques_latence
+
+
+def lier_session(fn):
+    """fn à exécuter dans un autre thread, ses mesures comptées aussi pour la session appelante."""
+    session = metriques_session()
+    if session is None:
+        return fn
+
+    @functools.wraps(fn)
+    def liee(*args, **kwargs):
+        jeton = _METRIQUES_LIEES.set(session)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _METRIQUES_LIEES.reset(jeton)
+    return liee
+
+
+def enregistrer(endpoint, **mesures):
+    METRIQUES_PROCESSUS.enregistrer(endpoint, **mesures)
+    session = metriques_session()
+    if session is not None:
+        session.enregistrer(endpoint, **mesures)
+
+
+def nb_retries(response):
+    """Relances faites par urllib3 pour obtenir cette réponse."""
+    retries = getattr(response.raw, "retries", None)
+    return len(retries.history) if retries is not None else 0
+
+
+def mesures_octets(response):
+    """octets_env / octets_rec / fil_env / fil_rec d'une réponse de KlemoApiClient."""
+    octets = response.octets
+    return {"octets_env": octets["env"] or None, "octets_rec": octets["rec"],
+            "fil_env": octets["env_fil"] or None, "fil_rec": octets["rec_fil"]}
+
+
+def chrono(nom):
+    """Décorateur : temps mur de la fonction enregistré sous l'endpoint `nom`."""
+    def decorateur(fn):
+        @functools.wraps(fn)
+        def enveloppe(*args, **kwargs):
+            debut = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                enregistrer(nom, wall=time.perf_counter() - debut)
+        return enveloppe
+    return decorateur
+
+
+def panneau_vols(vols):
+    """Compteurs instantanés d'un VolsEnCours (client HTTP partagé)."""
+    stats = vols.stats()
+    colonnes = st.columns(4)
+    colonnes[0].metric("Appels en vol", stats["en_vol"])
+    colonnes[1].metric("Max en vol", stats["max_en_vol"])
+    colonnes[2].metric("Appels", stats["appels"])
+    colonnes[3].metric("Coalescés", stats["coalesces"],
+                       help="appels servis par un appel identique déjà en vol")
+
+
+def panneau_latences():
+    """Tableau p50 / p95 / p99 par endpoint, pour la session et pour le processus."""
+    for titre, metriques in (("Session", metriques_session()), ("Processus", METRIQUES_PROCESSUS)):
+        st.subheader(f"⏱️ {titre}")
+        lignes = metriques.resume() if metriques is not None else []
+        if not lignes:
+            st.info("Aucune mesure pour l'instant.")
+            continue
+        st.caption(f"depuis {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(metriques.debut))}")
+        st.dataframe(
+            lignes,
+            use_container_width=True,
+            column_config={col: st.column_config.NumberColumn(format="%.3f")
+                           for col in ["moyenne", "max"] + [f"p{q}" for q in PERCENTILES]}
+        )
+        st.button(f"Réinitialiser ({titre.lower()})", key=f"reset_latences_{titre}", on_click=metriques.reset)
@@ -0,0 +1,301 @@
+import os
+import sys
+import gzip
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from helpers.cache import cle_cache
+
+
+################################
+##### SERVEUR API SIMULE ####
+################################
+# Remplaçant local de l'API Algo Klemo pour travailler hors ligne : mêmes routes,
+# mêmes formats ({"data_ctxt": ...} en entrée, {"output": ...} en sortie), avec
+# latences tirées selon une loi, séquences de 202 sur strat_result et taux d'erreur
+# par endpoint. Pour y brancher l'appli ou le pipeline :
+#
+#   python -m helpers.mock_server --port 8765 --latence proj=lognormal:0.8,0.4 --polls 3
+#   KLEMO_API_BASE=http://127.0.0.1:8765/v1 streamlit run app.py
+#
+# Vers un hôte local (127.0.0.1, localhost), func n'active pas la signature SigV4 :
+# aucun identifiant AWS n'est nécessaire.
+#
+# Réponses rejouées (dossier --enregistrements), par ordre de priorité :
+#   <endpoint>/<cle_cache(endpoint, data_ctxt)>.json   réponse d'un payload précis
+#   strat_result/<objectif>_<sousObjectif>.json        (strat_result uniquement)
+#   <endpoint>.json                                    réponse par défaut de l'endpoint
+# À défaut, fill-score renvoie le payload reçu (les json/*.json sont déjà enrichis)
+# et les autres endpoints une réponse synthétique au format attendu par les pages.
+
+ENDPOINTS = ("fill-score", "proj", "strat_init", "strat_result", "souscription")
+PORT_DEFAUT = 8765
+
+# comme l'API Gateway (minimumCompressionSize) : réponses gzip au-delà de cette taille
+# si le client l'accepte, corps de requête gzip (Content-Encoding) acceptés
+SEUIL_GZIP = 1024
+
+
+def loi_latence(spec):
+    """
+    'const:0.2', 'uniform:0.1,0.5', 'normal:0.3,0.05' ou 'lognormal:mu,sigma' (secondes,
+    paramètres de la loi normale sous-jacente pour lognormal) -> fonction rng -> secondes.
+    """
+    nom, _, params = spec.partition(":")
+    p = [float(x) for x in params.split(",")] if params else []
+    lois = {
+        "const":     lambda rng: p[0],
+        "uniform":   lambda rng: rng.uniform(p[0], p[1]),
+        "normal":    lambda rng: max(0.0, rng.gauss(p[0], p[1])),
+        "lognormal": lambda rng: rng.lognormvariate(p[0], p[1])
+    }
+    if nom not in lois:
+        raise ValueError(f"loi de latence inconnue : {spec}")
+    return lois[nom]
+
+
+def _synth_proj(nb_annees=20, debut=2026):
+    """output Proj minimal au format lu par func.display_bilan_synth."""
+    dates = [f"{debut + k}-12-31" for k in range(nb_annees)]
+    asset = []
+    for k, date in enumerate(dates):
+        ligne = {"dates": date}
+        for poste, valeur in (("Fin", 50000), ("Immo", 250000), ("Scpi", 0), ("Emprunt", -120000),
+                              ("Pro", 0), ("Treso", 10000), ("Total", 190000)):
+            median = valeur * 1.03 ** k
+            ligne.update({f"{poste}Pct5": round(median * 0.8), f"{poste}Pct50": round(median),
+                          f"{poste}Pct95": round(median * 1.25)})
+        asset.append(ligne)
+    cashflow = [{"dates": date, "RevenusActivite": 45000, "RetraiteRentePension": 0,
+                 "RetraitDivActifFinancier": 0, "RevenusImmobilier": 0, "DepensesCourantes": -21600,
+                 "Emprunt": -9600, "RevenusScpiNet": 0, "RevenusProNet": 0, "ImpotsBareme": -4200,
+                 "ImpotsAutres": 0} for date in dates]
+    return {
+        "patSynth": {"patFin": 50000, "patImmo": 250000, "patPro": 0, "patEmprunt": -120000,
+                     "patBrut": 300000, "patNet": 180000},
+        "assetSynth": asset,
+        "cashflowSynth": cashflow,
+        "cashflowCourantReel": [{"dates": date, "RevenusActiviteReel": 45000, "DepensesActiviteReel": 35400}
+                                for date in dates],
+        "cashflowImpotsPhoto": {"NombrePartFiscale": 1, "RevenuBrutTotal": 45000, "TMI": 0.3,
+                                "TauxBaremeProgressif": 0.093, "IRBareme": 4200, "PSBareme": 0,
+                                "IRPreleve": 0, "PSPreleve": 0, "MontantImpotsIFI": 0, "TVARevenus": 0,
+                                "Taxes": 1200}
+    }
+
+
+def _synth_strat(payload_strat):
+    """output strat_result minimal (une reco) au format lu par func.display_strat_output."""
+    metrique = lambda nom, libelle: {"name": nom, "libelle": libelle, "description": f"{libelle} (simulé)",
+                                     "value": 10000}
+    return [{
+        "texteStrat": {"titre": f"Reco simulée {payload_strat.get('objectif')}/{payload_strat.get('sousObjectif')}",
+                       "description": "Réponse du serveur simulé.",
+                       "avantage": ["simulé"], "inconvenient": ["simulé"]},
+        "attribut": {"prioGlobal": 0, "bestVarIndex": 0,
+                     "metrique1": metrique("gain", "Gain"), "metrique2": metrique("effort", "Effort")},
+        "variantesResult": [{"metriques": {
+            "libVariante": "Variante simulée",
+            "assetDif": [{"index": f"{2026 + k}-12-31", "pct5": -1000 * k, "pct50": 500 * k, "pct95": 2000 * k}
+                         for k in range(20)],
+            "difCout": [{"horizon": k, "CoutsFraisTotal": 150 * k, "PctCoutsFraisTotal": 0.015}
+                        for k in range(1, 21)]}}]
+    }]
+
+
+def _synth_souscription():
+    return {
+        "evolution": [{"horizon": k, "ValuePct5": round(10000 * 1.01 ** k), "ValuePct50": round(10000 * 1.04 ** k),
+                       "ValuePct95": round(10000 * 1.07 ** k)} for k in range(1, 21)],
+        "allocation": {"Coté": 0.7, "Non Coté": 0.3}
+    }
+
+
+class MockKlemoServer(ThreadingHTTPServer):
+    """
+    latences : {endpoint: fonction rng -> secondes}
+    erreurs  : {endpoint: taux de réponses en erreur (code_erreur)}
+    polls    : nombre de 202 renvoyés par strat_result avant le résultat
+    """
+
+    daemon_threads = True
+
+    def __init__(self, adresse=("127.0.0.1", PORT_DEFAUT), latences=None, erreurs=None, polls=2,
+                 code_erreur=503, enregistrements=None, seed=None, seuil_gzip=SEUIL_GZIP):
+        super().__init__(adresse, _Handler)
+        self.latences = dict(latences or {})
+        self.erreurs = dict(erreurs or {})
+        self.polls = polls
+        self.code_erreur = code_erreur
+        self.enregistrements = enregistrements
+        self.seuil_gzip = seuil_gzip
+        self.rng = random.Random(seed)
+        self._lock = threading.Lock()
+        # {requestId: [payload strat_init, nombre de polls reçus]}
+        self.strats = {}
+        self.nb_requetes = dict.fromkeys(ENDPOINTS, 0)
+
+    @property
+    def base_url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}/v1"
+
+    def start(self):
+        """Sert dans un thread de fond et renvoie l'URL de base à passer à KLEMO_API_BASE."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self.base_url
+
+    def tirage(self, endpoint):
+        """(latence en secondes, erreur injectée ?) pour un appel à endpoint."""
+        with self._lock:
+            self.nb_requetes[endpoint] += 1
+            latence = self.latences[endpoint](self.rng) if endpoint in self.latences else 0.0
+            return latence, self.rng.random() < self.erreurs.get(endpoint, 0.0)
+
+    def rejoue(self, *chemins):
+        if not self.enregistrements:
+            return None
+        for chemin in chemins:
+            fichier = os.path.join(self.enregistrements, f"{chemin}.json")
+            if os.path.isfile(fichier):
+                with open(fichier, encoding="utf-8") as f:
+                    return json.load(f)
+        return None
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _repondre(self, code, corps):
+        contenu = json.dumps(corps, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        seuil = self.server.seuil_gzip
+        if seuil is not None and len(contenu) >= seuil and "gzip" in self.headers.get("Accept-Encoding", ""):
+            contenu = gzip.compress(contenu)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(contenu)))
+        self.end_headers()
+        self.wfile.write(contenu)
+
+    def _route(self):
+        morceaux = self.path.split("?")[0].strip("/").split("/")
+        if len(morceaux) < 2 or morceaux[0] != "v1" or morceaux[1] not in ENDPOINTS:
+            return None, None
+        return morceaux[1], (morceaux[2] if len(morceaux) > 2 else None)
+
+    def _injecter(self, endpoint):
+        latence, erreur = self.server.tirage(endpoint)
+        time.sleep(latence)
+        if erreur:
+            self._repondre(self.server.code_erreur, {"message": "erreur injectée"})
+        return erreur
+
+    def do_POST(self):
+        endpoint, _ = self._route()
+        longueur = int(self.headers.get("Content-Length", 0))
+        corps = self.rfile.read(longueur)
+        if self.headers.get("Content-Encoding") == "gzip":
+            corps = gzip.decompress(corps)
+        if endpoint is None or endpoint == "strat_result":
+            return self._repondre(404, {"message": "Not Found"})
+        if self._injecter(endpoint):
+            return
+        try:
+            data_ctxt = json.loads(corps)["data_ctxt"]
+        except (ValueError, KeyError, TypeError):
+            return self._repondre(400, {"message": "payload {'data_ctxt': ...} attendu"})
+        serveur = self.server
+        enregistree = serveur.rejoue(f"{endpoint}/{cle_cache(endpoint, data_ctxt)}", endpoint)
+
+        if endpoint == "fill-score":
+            self._repondre(200, enregistree or {"output": data_ctxt})
+        elif endpoint == "proj":
+            request_id = uuid.uuid4().hex
+            reponse = enregistree or {"output": _synth_proj()}
+            self._repondre(200, {**reponse, "requestId": request_id, "requestKey": f"mock/{request_id}"})
+        elif endpoint == "strat_init":
+            request_id = data_ctxt.get("requestId")
+            with serveur._lock:
+                serveur.strats[request_id] = [data_ctxt, 0]
+            self._repondre(200, enregistree or {"requestId": request_id, "message": "strat lancée"})
+        else:
+            self._repondre(200, enregistree or {"output": _synth_souscription()})
+
+    def do_GET(self):
+        endpoint, request_id = self._route()
+        if endpoint != "strat_result" or request_id is None:
+            return self._repondre(404, {"message": "Not Found"})
+        if self._injecter(endpoint):
+            return
+        serveur = self.server
+        with serveur._lock:
+            strat = serveur.strats.get(request_id)
+            if strat is not None:
+                strat[1] += 1
+        if strat is None:
+            return self._repondre(404, {"message": f"requestId inconnu : {request_id}"})
+        payload_strat, nb_polls = strat
+        if nb_polls <= serveur.polls:
+            return self._repondre(202, {"message": "Processing"})
+        enregistree = serveur.rejoue(
+            f"strat_result/{cle_cache('strat_result', payload_strat)}",
+            f"strat_result/{payload_strat.get('objectif')}_{payload_strat.get('sousObjectif')}",
+            "strat_result")
+        self._repondre(200, enregistree or {"output": _synth_strat(payload_strat)})
+
+
+def _par_endpoint(valeurs, conversion):
+    """['proj=lognormal:0.8,0.4', 'strat_result=0.1'] -> {endpoint: conversion(valeur)} ; sans 'endpoint=', tous."""
+    resultat = {}
+    for valeur in valeurs or []:
+        endpoint, egal, spec = valeur.partition("=")
+        if not egal or endpoint not in ENDPOINTS:
+            resultat.update(dict.fromkeys(ENDPOINTS, conversion(valeur)))
+        else:
+            resultat[endpoint] = conversion(spec)
+    return resultat
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Serveur local simulant l'API Algo Klemo.",
+        epilog="Avec KLEMO_API_BASE=http://127.0.0.1:<port>/v1, les appels ne sont pas signés : "
+               "aucun identifiant AWS n'est nécessaire.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=PORT_DEFAUT)
+    parser.add_argument("--latence", action="append",
+                        help="[endpoint=]loi, ex. proj=lognormal:0.8,0.4 (répétable)")
+    parser.add_argument("--erreurs", action="append", help="[endpoint=]taux d'erreur, ex. proj=0.05")
+    parser.add_argument("--code-erreur", type=int, default=503)
+    parser.add_argument("--polls", type=int, default=2, help="nombre de 202 avant le résultat strat")
+    parser.add_argument("--enregistrements", help="dossier de réponses rejouées")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--sans-gzip", action="store_true", help="réponses jamais compressées")
+    args = parser.parse_args(argv)
+
+    serveur = MockKlemoServer((args.host, args.port),
+                              latences=_par_endpoint(args.latence, loi_latence),
+                              erreurs=_par_endpoint(args.erreurs, float),
+                              polls=args.polls, code_erreur=args.code_erreur,
+                              enregistrements=args.enregistrements, seed=args.seed,
+                              seuil_gzip=None if args.sans_gzip else SEUIL_GZIP)
+    print(f"API simulée sur {serveur.base_url} (KLEMO_API_BASE={serveur.base_url})", file=sys.stderr)
+    try:
+        serveur.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        serveur.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import os
+import sys
+import json
+import argparse
+
+from helpers.simul_contraint_main_sous_cat_v2 import (
+    TAILLE_LOT_POPULATION, CopuleMontants, ImputeurJson, client_from_batch, import_json, simul_lots)
+
+
+################################
+##### FLUX DE PAYLOADS ####
+################################
+# Produit des payloads prêts pour FillScore (le json_payload de func.call_api) à
+# partir d'une graine et d'un nombre de clients, un lot à la fois : la mémoire reste
+# bornée à un lot quel que soit n. Les clients sont ceux de simul_population(n, seed).
+#
+# Exemple :
+#   python -m helpers.payload_stream -n 1000000 --seed 42 -o personas.ndjson
+
+GABARIT_PAYLOAD = "json/vide_new.json"
+
+
+def generer_payloads(n, seed, gabarit=GABARIT_PAYLOAD, taille_lot=TAILLE_LOT_POPULATION, **kwargs):
+    """Générateur paresseux des n payloads FillScore ; kwargs est passé à simul_obj_client_batch."""
+    imputeur = ImputeurJson(import_json(gabarit))
+    for lot in simul_lots(n, seed, taille_lot=taille_lot, compact=True, **kwargs):
+        for i in range(len(lot['perso'])):
+            yield imputeur.build(client_from_batch(lot, i))
+
+
+def ecrire_ndjson(payloads, fichier):
+    """Écrit un payload JSON par ligne ; retourne le nombre de lignes écrites."""
+    nb = 0
+    for payload in payloads:
+        fichier.write(json.dumps(payload, ensure_ascii=False))
+        fichier.write("\n")
+        nb += 1
+    return nb
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Génère des payloads FillScore en NDJSON.")
+    parser.add_argument("-n", "--nombre", type=int, required=True, help="nombre de clients")
+    parser.add_argument("--seed", type=int, required=True, help="graine de la population")
+    parser.add_argument("-o", "--output", default="-", help="fichier NDJSON de sortie ('-' pour stdout)")
+    parser.add_argument("--gabarit", default=GABARIT_PAYLOAD, help="gabarit JSON vide")
+    parser.add_argument("--taille-lot", type=int, default=TAILLE_LOT_POPULATION)
+    parser.add_argument("--copule", action="store_true", help="montants tirés par la copule gaussienne")
+    args = parser.parse_args(argv)
+
+    kwargs = {'copule': CopuleMontants()} if args.copule else {}
+    payloads = generer_payloads(args.nombre, args.seed, gabarit=args.gabarit,
+                                taille_lot=args.taille_lot, **kwargs)
+    if args.output == "-":
+        try:
+            nb = ecrire_ndjson(payloads, sys.stdout)
+            sys.stdout.flush()
+        except BrokenPipeError:
+            # lecteur fermé avant la fin (ex. | head) : arrêt sans trace
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            return
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            nb = ecrire_ndjson(payloads, f)
+    print(f"{nb} payloads écrits", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+import os
+import sys
+import json
+import time
+import glob
+import random
+import asyncio
+import weakref
+import argparse
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor
+
+from helpers import func
+from helpers.aws_credentials import IdentifiantsAWSManquants
+from helpers.metrics import enregistrer, lier_session, mesures_octets, nb_retries
+
+
+################################
+##### PIPELINE ASYNCHRONE ####
+################################
+# Enchaîne FillScore -> Proj -> StratInit -> strat_result pour de nombreux personas
+# sans page Streamlit. Les appels HTTP restent ceux de func (client poolé, signé) et
+# tournent dans un pool de threads ; asyncio recouvre les attentes réseau d'un persona
+# à l'autre. Chaque étape a sa propre limite de concurrence et les résultats sortent
+# dans l'ordre où ils se terminent.
+#
+# Après un Proj, run_objectifs enchaîne StratInit + strat_result pour toutes les
+# paires (objectif, sous-objectif) sur le même résultat Proj. strat_result étant
+# indexé par le requestId du Proj, ces strats passent l'une après l'autre : les
+# lancer en parallèle demande un requestId par strat, que l'API ne fournit pas.
+#
+# Exemple :
+#   python -m helpers.pipeline json/t*.json json/q*.json json/p4_*.json -o resultats.ndjson
+#   python -m helpers.payload_stream -n 100 --seed 42 | python -m helpers.pipeline - -o resultats.ndjson
+
+ETAPES = ("fill_score", "proj", "strat_init", "strat_result")
+
+# appels simultanés maximum par étape
+CONCURRENCE_DEFAUT = {
+    "fill_score":   8,
+    "proj":         4,
+    "strat_init":   4,
+    "strat_result": 8
+}
+
+OBJECTIF_DEFAUT = ("Investir", "Investir régulièrement")
+PARAM_OBJECTIF_DEFAUT = {"debut": "2030-12-10", "horizon": 20}
+INVESTOR_PROFILE_DEFAUT = {"level": "Dynamic", "esg": "Neutral"}
+
+# strat_result est indexé par le requestId du Proj : deux strats sur un même Proj ne
+# doivent pas se chevaucher, de StratInit à la fin du polling, quels que soient le job
+# (reco, comparaison des objectifs) et la session qui les lancent.
+# {requestId: verrou}, oublié quand plus personne ne le tient ni ne l'attend
+_VERROUS_STRAT = weakref.WeakValueDictionary()
+_VERROUS_LOCK = threading.Lock()
+# attente entre deux essais d'un verrou pris, côté asyncio (secondes)
+ATTENTE_VERROU = 0.05
+
+
+def paires_objectifs():
+    """[(objectif, sous-objectif)] au format des selectbox des pages."""
+    return [(objectif, sous_objectif)
+            for objectif, sous_objectifs in func.OBJECTIF_CHOICES.items()
+            for sous_objectif in sous_objectifs]
+
+
+def verrou_strat(request_id):
+    """Verrou du processus réservé aux strats du Proj request_id."""
+    with _VERROUS_LOCK:
+        verrou = _VERROUS_STRAT.get(request_id)
+        if verrou is None:
+            # Semaphore plutôt que Lock : seul un objet Python accepte une référence faible
+            verrou = _VERROUS_STRAT[request_id] = threading.BoundedSemaphore(1)
+        return verrou
+
+
+def id_poll(init_strat, payload):
+    """requestId à interroger sur strat_result : celui rendu par StratInit, à défaut celui du payload."""
+    return init_strat.get("requestId") or payload["requestId"]
+
+
+def payload_strat(json_synth, objectif, sous_objectif, param_objectif=None, investor_profile=None):
+    """payload StratInit tel que construit par les pages UserTest / Reco."""
+    return {
+        "requestId": json_synth["requestId"],
+        "requestKey": json_synth["requestKey"],
+        "objectif": func.MAPPINGS_OBJECTIF_CHOICES[objectif],
+        "sousObjectif": func.MAPPINGS_OBJECTIF_CHOICES[sous_objectif],
+        "paramObjectif": dict(param_objectif or PARAM_OBJECTIF_DEFAUT),
+        "investorProfile": dict(investor_profile or INVESTOR_PROFILE_DEFAUT)
+    }
+
+
+class Pipeline:
+    """Exécution d'un persona à travers les 4 étapes, sous les limites de concurrence par étape."""
+
+    def __init__(self, concurrency=None, objectif=OBJECTIF_DEFAUT[0], sous_objectif=OBJECTIF_DEFAUT[1],
+                 param_objectif=None, investor_profile=None, schedule=None, use_cache=True):
+        if concurrency is None:
+            concurrency = CONCURRENCE_DEFAUT
+        elif isinstance(concurrency, int):
+            concurrency = dict.fromkeys(ETAPES, concurrency)
+        self.concurrency = {**CONCURRENCE_DEFAUT, **concurrency}
+        self.semaphores = {etape: asyncio.Semaphore(self.concurrency[etape]) for etape in ETAPES}
+        self.objectif, self.sous_objectif = objectif, sous_objectif
+        self.param_objectif, self.investor_profile = param_objectif, investor_profile
+        self.schedule = {**func.POLL_SCHEDULE, **(schedule or {})}
+        self.use_cache = use_cache
+        # un thread par appel simultané possible
+        self.executor = ThreadPoolExecutor(max_workers=sum(self.concurrency.values()),
+                                           thread_name_prefix="pipeline")
+
+    async def _appel(self, etape, fn, *args):
+        async with self.semaphores[etape]:
+            # les threads de l'executor n'ont pas de session Streamlit : on lie celle de l'appelant
+            return await asyncio.get_running_loop().run_in_executor(self.executor, lier_session(fn), *args)
+
+    async def _poll(self, request_id):
+        """Version asynchrone de func.poll_result : (output, poll_count, time_to_result) ou None."""
+        schedule = self.schedule
+        url = f"{func.STRAT_RESULT_URL}/{request_id}"
+        debut = time.monotonic()
+        intervalle = schedule["premier"]
+        poll_count = 0
+        while True:
+            restant = schedule["deadline"] - (time.monotonic() - debut)
+            if restant <= 0:
+                return None
+            # l'attente se fait hors sémaphore : seuls les GET occupent un slot
+            await asyncio.sleep(min(intervalle * random.uniform(1 - schedule["jitter"], 1 + schedule["jitter"]), restant))
+            debut_get = time.perf_counter()
+            try:
+                response = await self._appel("strat_result", func.api_client.get, url)
+                poll_count += 1
+                enregistrer("strat_result", wall=time.perf_counter() - debut_get,
+                            serveur=response.elapsed.total_seconds(), retries=nb_retries(response),
+                            **mesures_octets(response))
+                if response.status_code == 200:
+                    output = response.json()["output"]
+                    enregistrer("strat_result [polling]", wall=time.monotonic() - debut, polls=poll_count)
+                    return output, poll_count, round(time.monotonic() - debut, 2)
+                elif response.status_code == 202:
+                    intervalle = min(max(intervalle, 0.1) * schedule["facteur"], schedule["max"])
+                else:
+                    print(f"Error strat_result {request_id}:", response.text, file=sys.stderr)
+                    return None
+            except (requests.exceptions.RequestException, IdentifiantsAWSManquants, ValueError, KeyError) as e:
+                # un persona en échec ne doit pas interrompre tout le lot
+                print(f"Error strat_result {request_id}: {e}", file=sys.stderr)
+                enregistrer("strat_result [erreur]", wall=time.perf_counter() - debut_get)
+                return None
+
+    async def run(self, nom, base, objectif=None, sous_objectif=None):
+        objectif = objectif or self.objectif
+        sous_objectif = sous_objectif or self.sous_objectif
+        resultat = {"nom": nom, "objectif": objectif, "sousObjectif": sous_objectif,
+                    "statut": "erreur", "etape": None, "durees": {}}
+        debut = time.monotonic()
+
+        def fin(etape, t0):
+            resultat["durees"][etape] = round(time.monotonic() - t0, 3)
+
+        resultat["etape"] = "fill_score"
+        t0 = time.monotonic()
+        json_proj, _ = await self._appel("fill_score", func.call_api, base, func.FILL_SCORE_URL,
+                                        self.use_cache)
+        fin("fill_score", t0)
+        if not json_proj:
+            return resultat
+
+        resultat["etape"] = "proj"
+        t0 = time.monotonic()
+        json_synth, _ = await self._appel("proj", func.call_api, json_proj["output"], func.PROJ_URL,
+                                         self.use_cache)
+        fin("proj", t0)
+        if not json_synth:
+            return resultat
+        resultat["requestId"] = json_synth["requestId"]
+        resultat["requestKey"] = json_synth["requestKey"]
+
+        strat = payload_strat(json_synth, objectif, sous_objectif, self.param_objectif, self.investor_profile)
+        await self.run_strat(strat, resultat)
+        if resultat["statut"] == "ok":
+            resultat["duree"] = round(time.monotonic() - debut, 3)
+        return resultat
+
+    async def run_strat(self, strat, resultat):
+        """StratInit puis polling de strat_result pour le payload strat ; complète resultat."""
+        verrou = verrou_strat(strat["requestId"])
+        # essais non bloquants : une tâche annulée pendant l'attente ne garde pas le verrou
+        while not verrou.acquire(blocking=False):
+            await asyncio.sleep(ATTENTE_VERROU)
+        try:
+            return await self._run_strat(strat, resultat)
+        finally:
+            verrou.release()
+
+    async def _run_strat(self, strat, resultat):
+
+        def fin(etape, t0):
+            resultat["durees"][etape] = round(time.monotonic() - t0, 3)
+
+        resultat["etape"] = "strat_init"
+        t0 = time.monotonic()
+        init_strat, _ = await self._appel("strat_init", func.call_api, strat, func.STRAT_INIT_URL)
+        fin("strat_init", t0)
+        if not init_strat:
+            return resultat
+
+        resultat["etape"] = "strat_result"
+        t0 = time.monotonic()
+        poll = await self._poll(id_poll(init_strat, strat))
+        fin("strat_result", t0)
+        if poll is None:
+            return resultat
+        resultat["output"], resultat["poll_count"], resultat["time_to_result"] = poll
+
+        resultat["statut"] = "ok"
+        resultat["etape"] = None
+        return resultat
+
+
+async def run_pipeline_batch(payloads, concurrency=None, objectif=OBJECTIF_DEFAUT[0],
+                             sous_objectif=OBJECTIF_DEFAUT[1], param_objectif=None,
+                             investor_profile=None, schedule=None, use_cache=True):
+    """
+    Générateur asynchrone des résultats du pipeline, dans l'ordre d'achèvement.
+
+    payloads : dict {nom: base FillScore}, ou itérable de bases (nommées par leur rang)
+    ou de paires (nom, base), consommé au fur et à mesure.
+    concurrency : int (toutes étapes) ou dict par étape.
+    Chaque résultat porte nom, statut ('ok' / 'erreur'), etape (étape en échec),
+    durees par étape et, en cas de succès, output, poll_count et time_to_result.
+    """
+    pipeline = Pipeline(concurrency, objectif, sous_objectif, param_objectif, investor_profile, schedule,
+                        use_cache)
+    if isinstance(payloads, dict):
+        entrees = iter(payloads.items())
+    else:
+        entrees = ((e if isinstance(e, tuple) else (i, e)) for i, e in enumerate(payloads))
+    # nombre de personas engagés à la fois : assez pour occuper toutes les étapes
+    # (les personas en attente de polling n'occupent aucun slot) sans matérialiser
+    # tout l'itérable
+    fenetre = 4 * sum(pipeline.concurrency.values())
+    en_cours = set()
+    try:
+        while True:
+            for nom, base in entrees:
+                en_cours.add(asyncio.create_task(pipeline.run(nom, base)))
+                if len(en_cours) >= fenetre:
+                    break
+            if not en_cours:
+                return
+            termines, en_cours = await asyncio.wait(en_cours, return_when=asyncio.FIRST_COMPLETED)
+            for tache in termines:
+                yield tache.result()
+    finally:
+        for tache in en_cours:
+            tache.cancel()
+        pipeline.executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def run_objectifs(strat, paires=None, schedule=None):
+    """
+    Générateur asynchrone : StratInit + strat_result pour chaque paire (objectif,
+    sous-objectif) sur le même résultat Proj, l'une après l'autre (verrou_strat).
+
+    strat : payload StratInit de référence (requestId, requestKey, paramObjectif,
+    investorProfile) ; seuls objectif et sousObjectif changent d'une paire à l'autre.
+    paires : par défaut toutes celles de func.OBJECTIF_CHOICES.
+    Chaque résultat porte rang, objectif, sousObjectif, statut, etape, durees et, en
+    cas de succès, output, poll_count et time_to_result.
+    """
+    paires = paires_objectifs() if paires is None else list(paires)
+    pipeline = Pipeline(schedule=schedule)
+    try:
+        for rang, (objectif, sous_objectif) in enumerate(paires):
+            resultat = {"rang": rang, "objectif": objectif, "sousObjectif": sous_objectif,
+                        "statut": "erreur", "etape": None, "durees": {}}
+            payload = {**strat,
+                       "objectif": func.MAPPINGS_OBJECTIF_CHOICES[objectif],
+                       "sousObjectif": func.MAPPINGS_OBJECTIF_CHOICES[sous_objectif]}
+            yield await pipeline.run_strat(payload, resultat)
+    finally:
+        pipeline.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def lire_payloads(chemins):
+    """{nom: base} depuis des fichiers JSON (motifs glob acceptés) ou un flux NDJSON ('-')."""
+    for chemin in chemins:
+        if chemin == "-":
+            for i, ligne in enumerate(sys.stdin):
+                if ligne.strip():
+                    yield f"stdin:{i}", json.loads(ligne)
+        elif chemin.endswith(".ndjson"):
+            with open(chemin, encoding="utf-8") as f:
+                for i, ligne in enumerate(f):
+                    if ligne.strip():
+                        yield f"{chemin}:{i}", json.loads(ligne)
+        else:
+            for fichier in sorted(glob.glob(chemin)):
+                with open(fichier, encoding="utf-8") as f:
+                    yield os.path.splitext(os.path.basename(fichier))[0], json.load(f)
+
+
+async def _main(args):
+    concurrency = {etape: getattr(args, etape) for etape in ETAPES if getattr(args, etape)}
+    sortie = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    nb, nb_ok = 0, 0
+    try:
+        async for resultat in run_pipeline_batch(lire_payloads(args.payloads),
+                                                 concurrency=concurrency, objectif=args.objectif,
+                                                 sous_objectif=args.sous_objectif,
+                                                 param_objectif=json.loads(args.param_objectif)):
+            sortie.write(json.dumps(resultat, ensure_ascii=False) + "\n")
+            sortie.flush()
+            nb += 1
+            nb_ok += resultat["statut"] == "ok"
+            print(f"{resultat['nom']}: {resultat['statut']} {resultat['durees']}", file=sys.stderr)
+    finally:
+        if sortie is not sys.stdout:
+            sortie.close()
+    print(f"{nb_ok}/{nb} personas traités", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lance FillScore -> Proj -> Strat sur un lot de personas.")
+    parser.add_argument("payloads", nargs="+", help="fichiers JSON (glob), NDJSON, ou '-' pour stdin NDJSON")
+    parser.add_argument("-o", "--output", default="-", help="fichier NDJSON des résultats ('-' pour stdout)")
+    parser.add_argument("--objectif", default=OBJECTIF_DEFAUT[0], choices=list(func.OBJECTIF_CHOICES))
+    parser.add_argument("--sous-objectif", default=OBJECTIF_DEFAUT[1])
+    parser.add_argument("--param-objectif", default=json.dumps(PARAM_OBJECTIF_DEFAUT))
+    for etape in ETAPES:
+        parser.add_argument(f"--{etape.replace('_', '-')}", dest=etape, type=int,
+                            help=f"concurrence de l'étape {etape} (défaut {CONCURRENCE_DEFAUT[etape]})")
+    args = parser.parse_args(argv)
+    if args.sous_objectif not in func.OBJECTIF_CHOICES[args.objectif]:
+        parser.error(f"--sous-objectif doit être parmi {func.OBJECTIF_CHOICES[args.objectif]}")
+    asyncio.run(_main(args))
+
+
+if __name__ == "__main__":
+    main()
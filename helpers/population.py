@@ -0,0 +1,128 @@
+import os
+import json
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from helpers.simul_contraint_main_sous_cat_v2 import SECTIONS_LIGNES, VOCABULAIRES
+
+
+################################
+##### POPULATION COLONNAIRE ####
+################################
+# Une population de clients stockée section par section : une table plate par
+# section (perso, cashflow, fin, immo, pro, emprunt) et, pour chaque section à
+# lignes multiples, un tableau d'offsets de type CSR de longueur n+1 :
+# les lignes du client i sont table[offsets[i]:offsets[i+1]].
+# Les tables restent au format Arrow (chaînes encodées en dictionnaire à la lecture),
+# seul le client demandé est converti en tableaux structurés numpy.
+# Un champ entier qui code des libellés porte son vocabulaire dans le schéma ; à la
+# relecture, les codes sont ramenés à VOCABULAIRES_CODES s'ils diffèrent.
+
+SECTIONS = ['perso', 'cashflow'] + SECTIONS_LIGNES
+FICHIER_OFFSETS = "offsets.parquet"
+CLE_DTYPE = b"numpy_dtype"
+CLE_VOCABULAIRES = b"vocabulaires"
+# vocabulaires des champs entiers qui codent des libellés, {champ: libellés}
+VOCABULAIRES_CODES = {nom: vocabulaire.libelles for nom, vocabulaire in VOCABULAIRES.items()}
+
+
+def _vers_table(arr):
+    table = pa.table({nom: arr[nom] for nom in arr.dtype.names})
+    # le dtype numpy d'origine est conservé dans le schéma pour la relecture
+    metadata = {CLE_DTYPE: json.dumps(np.lib.format.dtype_to_descr(arr.dtype)).encode()}
+    vocabulaires = {nom: list(libelles) for nom, libelles in VOCABULAIRES_CODES.items()
+                    if nom in arr.dtype.names and arr.dtype[nom].kind == 'i'}
+    if vocabulaires:
+        metadata[CLE_VOCABULAIRES] = json.dumps(vocabulaires, ensure_ascii=False).encode()
+    return table.replace_schema_metadata(metadata)
+
+
+def _recoder(table):
+    """Codes des champs catégoriels traduits du vocabulaire du fichier vers VOCABULAIRES_CODES."""
+    metadata = table.schema.metadata or {}
+    if CLE_VOCABULAIRES not in metadata:
+        return table
+    for nom, libelles in json.loads(metadata[CLE_VOCABULAIRES]).items():
+        cible = list(VOCABULAIRES_CODES.get(nom, libelles))
+        if libelles == cible:
+            continue
+        index = {libelle: code for code, libelle in enumerate(cible)}
+        inconnus = [libelle for libelle in libelles if libelle not in index]
+        if inconnus:
+            raise ValueError(f"{nom} : libellés hors vocabulaire {inconnus}")
+        colonne = table.column(nom).to_numpy()
+        correspondance = np.array([index[libelle] for libelle in libelles], dtype=colonne.dtype)
+        table = table.set_column(table.schema.get_field_index(nom), nom, pa.array(correspondance[colonne]))
+    # set_column conserve les métadonnées du schéma
+    return table
+
+
+def _dtype_table(table):
+    descr = json.loads(table.schema.metadata[CLE_DTYPE])
+    return np.lib.format.descr_to_dtype([tuple(champ) for champ in descr])
+
+
+def _vers_numpy(table, dtype):
+    arr = np.empty(table.num_rows, dtype=dtype)
+    for nom in dtype.names:
+        arr[nom] = table.column(nom).to_numpy(zero_copy_only=False)
+    return arr
+
+
+class Population:
+    """Population de clients en colonnes, avec accès O(1) au client i."""
+
+    def __init__(self, tables, offsets):
+        self.tables = tables
+        self.offsets = offsets
+        self.dtypes = {section: _dtype_table(table) for section, table in tables.items()}
+
+    @classmethod
+    def from_batch(cls, pat):
+        """Construit la population à partir d'un lot de simul_obj_client_batch / simul_population."""
+        n = len(pat['perso'])
+        tables = {section: _vers_table(pat[section]) for section in SECTIONS}
+        offsets = {section: np.searchsorted(pat['owner'][section], np.arange(n + 1)).astype('int64')
+                   for section in SECTIONS_LIGNES}
+        return cls(tables, offsets)
+
+    @classmethod
+    def read_parquet(cls, dossier):
+        offsets_table = pq.read_table(os.path.join(dossier, FICHIER_OFFSETS))
+        offsets = {section: offsets_table.column(section).to_numpy() for section in SECTIONS_LIGNES}
+        tables = {}
+        for section in SECTIONS:
+            chemin = os.path.join(dossier, f"{section}.parquet")
+            schema = pq.read_schema(chemin)
+            chaines = [champ.name for champ in schema if pa.types.is_string(champ.type)]
+            tables[section] = _recoder(pq.read_table(chemin, memory_map=True, read_dictionary=chaines))
+        return cls(tables, offsets)
+
+    def to_parquet(self, dossier):
+        os.makedirs(dossier, exist_ok=True)
+        for section, table in self.tables.items():
+            pq.write_table(table, os.path.join(dossier, f"{section}.parquet"))
+        pq.write_table(pa.table(self.offsets), os.path.join(dossier, FICHIER_OFFSETS))
+
+    def __len__(self):
+        return self.tables['perso'].num_rows
+
+    def client(self, i):
+        """Client i au format de simul_obj_client, sans convertir le reste de la population."""
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(f"client {i} hors de la population ({len(self)} clients)")
+        pat = {
+            'perso': _vers_numpy(self.tables['perso'].slice(i, 1), self.dtypes['perso']),
+            'cashflow': _vers_numpy(self.tables['cashflow'].slice(i, 1), self.dtypes['cashflow'])
+        }
+        for section in SECTIONS_LIGNES:
+            debut, fin = self.offsets[section][i], self.offsets[section][i + 1]
+            pat[section] = _vers_numpy(self.tables[section].slice(debut, fin - debut), self.dtypes[section])
+        return pat
+
+    def section(self, section):
+        """Section entière en tableau structuré numpy (matérialise toutes les lignes)."""
+        return _vers_numpy(self.tables[section], self.dtypes[section])
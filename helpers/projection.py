@@ -0,0 +1,158 @@
+import os
+import sys
+import json
+import argparse
+
+
+################################
+##### PROJECTION DES PAYLOADS ####
+################################
+# Réduit un payload aux sections et champs lus par un endpoint, avant sérialisation.
+# Spécification déclarative, par section du payload :
+#   None                         section gardée entière
+#   [sous-clés]                  sous-clés gardées entières
+#   {sous-clé: None | [champs]}  sous-clé entière, ou liste d'enregistrements réduits aux champs
+# Les sections absentes de la spécification sont retirées.
+
+# Proj repart de la sortie de FillScore : les listes *DetailAdj (ajustées) suffisent,
+# les *Detail bruts, DataScore, DataComment et Score(No)Quality ne sont pas envoyés.
+PROJECTION_PROJ = {
+    "Client":   ["PatClientDetailAdj"],
+    "Cashflow": ["PatCashflowDetailAdj"],
+    "Enfant":   ["PatEnfantDetailAdj"],
+    "Fin":      ["PatFinDetailAdj", "HistoInvest", "HistoValue"],
+    "Immo":     ["PatImmoDetailAdj", "HistoInvest", "HistoValue"],
+    "Pro":      ["PatProDetailAdj", "HistoInvest", "HistoValue"],
+    "Emprunt":  ["PatEmpruntDetailAdj", "HistoInvest", "HistoValue"]
+}
+
+# clés propres à chaque appel, ignorées à la comparaison des réponses
+CLES_VOLATILES = ("requestId", "requestKey")
+
+
+def projeter(payload, spec):
+    """Nouveau payload réduit à spec (le payload d'origine n'est pas modifié)."""
+    projete = {}
+    for section, spec_section in spec.items():
+        if section not in payload:
+            continue
+        valeur = payload[section]
+        if spec_section is None or not isinstance(valeur, dict):
+            projete[section] = valeur
+        elif isinstance(spec_section, dict):
+            projete[section] = {}
+            for cle, champs in spec_section.items():
+                if cle not in valeur:
+                    continue
+                if champs is None:
+                    projete[section][cle] = valeur[cle]
+                else:
+                    projete[section][cle] = [{champ: ligne[champ] for champ in champs if champ in ligne}
+                                             for ligne in valeur[cle]]
+        else:
+            projete[section] = {cle: valeur[cle] for cle in spec_section if cle in valeur}
+    return projete
+
+
+def differences(reference, candidat, chemin="", limite=20):
+    """Chemins où deux réponses JSON diffèrent (hors CLES_VOLATILES), au plus `limite`."""
+    ecarts = []
+
+    def parcours(a, b, chemin):
+        if len(ecarts) >= limite:
+            return
+        if isinstance(a, dict) and isinstance(b, dict):
+            for cle in a.keys() | b.keys():
+                if cle in CLES_VOLATILES:
+                    continue
+                if cle not in a or cle not in b:
+                    ecarts.append(f"{chemin}/{cle}")
+                else:
+                    parcours(a[cle], b[cle], f"{chemin}/{cle}")
+        elif isinstance(a, list) and isinstance(b, list) and len(a) == len(b):
+            for i, (x, y) in enumerate(zip(a, b)):
+                parcours(x, y, f"{chemin}[{i}]")
+        elif a != b:
+            ecarts.append(chemin or "/")
+
+    parcours(reference, candidat, chemin)
+    return ecarts
+
+
+def valider_projection(api_url, payloads, spec, enregistrements, enregistrer=False):
+    """
+    Compare, pour chaque payload, la réponse de api_url au payload projeté avec la
+    réponse de référence au payload complet, lue dans le dossier `enregistrements`
+    (format de helpers.mock_server). Sans référence enregistrée, le payload est en
+    écart ; avec enregistrer=True, la référence manquante est demandée à l'API puis
+    enregistrée : ce passage contre l'API réelle constitue les réponses que rejoue
+    le serveur simulé. Refusé contre un serveur local, dont les réponses ne sont
+    pas des références.
+    """
+    from helpers import func
+    from helpers.cache import cle_cache
+
+    if func.API_LOCALE:
+        raise ValueError(f"{func.API_BASE_URL} est un serveur local : projection non validable")
+    endpoint = func.nom_endpoint(api_url)
+    rapport = []
+    for nom, payload in payloads:
+        reference = None
+        fichier = os.path.join(enregistrements, endpoint, f"{cle_cache(endpoint, payload)}.json")
+        if os.path.isfile(fichier):
+            with open(fichier, encoding="utf-8") as f:
+                reference = json.load(f)
+        elif enregistrer:
+            reference, _ = func.call_api(payload, api_url, use_cache=False, projection=False)
+            if reference is not None:
+                os.makedirs(os.path.dirname(fichier), exist_ok=True)
+                with open(fichier, "w", encoding="utf-8") as f:
+                    json.dump(reference, f, ensure_ascii=False)
+        projete = projeter(payload, spec)
+        ligne = {"nom": nom, "octets": len(json.dumps(payload)), "octets_projete": len(json.dumps(projete))}
+        if reference is None:
+            ligne["ecarts"] = ["reponse manquante" if enregistrer else "reference non enregistree"]
+        else:
+            candidat, _ = func.call_api(projete, api_url, use_cache=False, projection=False)
+            ligne["ecarts"] = ["reponse manquante"] if candidat is None else differences(reference, candidat)
+        rapport.append(ligne)
+    return rapport
+
+
+def main(argv=None):
+    from helpers import func
+    from helpers.pipeline import lire_payloads
+
+    parser = argparse.ArgumentParser(description="Valide la projection d'un endpoint sur des payloads.")
+    parser.add_argument("payloads", nargs="+", help="fichiers JSON (glob) ou NDJSON")
+    parser.add_argument("--endpoint", default="proj", help="endpoint dont la projection est testée")
+    parser.add_argument("--enregistrements", required=True, help="dossier des réponses de référence")
+    parser.add_argument("--enregistrer", action="store_true",
+                        help="demande à l'API les références manquantes et les enregistre")
+    args = parser.parse_args(argv)
+
+    if func.API_LOCALE:
+        parser.error(f"KLEMO_API_BASE={func.API_BASE_URL} est un serveur local : ses réponses ne sont pas des références")
+    api_url = f"{func.API_BASE_URL}/{args.endpoint}"
+    if api_url not in func.PROJECTIONS:
+        parser.error(f"aucune projection configurée pour {api_url}")
+    payloads = list(lire_payloads(args.payloads))
+    if args.endpoint == "proj":
+        # Proj reçoit la sortie de FillScore, pas la base
+        sorties = []
+        for nom, base in payloads:
+            json_proj, _ = func.call_api(base, func.FILL_SCORE_URL)
+            if not json_proj:
+                parser.exit(1, f"{nom}: FillScore n'a pas répondu, projection non validée\n")
+            sorties.append((nom, json_proj["output"]))
+        payloads = sorties
+    rapport = valider_projection(api_url, payloads, func.PROJECTIONS[api_url], args.enregistrements,
+                                 args.enregistrer)
+    for ligne in rapport:
+        statut = "ok" if not ligne["ecarts"] else f"ECARTS {ligne['ecarts']}"
+        print(f"{ligne['nom']}: {ligne['octets']} -> {ligne['octets_projete']} octets, {statut}")
+    sys.exit(1 if any(ligne["ecarts"] for ligne in rapport) else 0)
+
+
+if __name__ == "__main__":
+    main()
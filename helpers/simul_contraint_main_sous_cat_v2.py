@@ -1,27 +1,73 @@
 import numpy as np
 from datetime import datetime
-from dateutil.relativedelta import relativedelta
-from scipy.stats import norm
+from scipy.special import ndtr
 import random
+import bisect
+import os
+from concurrent.futures import ProcessPoolExecutor
 import copy
 import json
 
 
+class PlageSampler:
+    """Table de plages compilée une fois : bornes cumulées triées et valeurs associées.
+
+    Une valeur u de [0, 1] tombe dans la première plage dont la borne sup est > u
+    (la dernière plage si u vaut 1), comme dans valeur_en_fonction_de_plage.
+    """
+
+    def __init__(self, plages):
+        plages_triees = sorted(plages.items())
+        self.bornes = np.array([borne_sup for borne_sup, _ in plages_triees], dtype='float64')
+        self.valeurs = np.array([texte for _, texte in plages_triees])
+        self._bornes = self.bornes.tolist()
+        self._valeurs = [texte for _, texte in plages_triees]
+        self._dernier = len(plages_triees) - 1
+
+    def valeur(self, u):
+        # chemin scalaire : bisect évite le coût d'appel de searchsorted sur un seul élément
+        return self._valeurs[min(bisect.bisect_right(self._bornes, u), self._dernier)]
+
+    def indices(self, u):
+        """Indice de plage de chaque tirage uniforme de u (un seul searchsorted)."""
+        return np.minimum(np.searchsorted(self.bornes, u, side='right'), self._dernier)
+
+    def tirer(self, u):
+        """Valeurs associées à un tableau de tirages uniformes u."""
+        return self.valeurs[self.indices(u)]
+
+    def sample(self, rng, size):
+        return self.tirer(rng.random(size))
+
+
+_plage_samplers = {}
+
+def plage_sampler(plages):
+    """Retourne la table compilée de `plages`, compilée au premier appel puis réutilisée.
+
+    Les tables *_plages sont des constantes de module : elles ne doivent pas être
+    modifiées après leur premier tirage.
+    """
+    entree = _plage_samplers.get(id(plages))
+    if entree is None or entree[0] is not plages:
+        if len(_plage_samplers) >= 512:
+            _plage_samplers.clear()
+        entree = (plages, PlageSampler(plages))
+        _plage_samplers[id(plages)] = entree
+    return entree[1]
+
+
 # Fonction pour générer une valeur en fonction de plages
 def valeur_en_fonction_de_plage(valeur, plages):
     if valeur < 0 or valeur > 1:
         return "Valeur hors de l'intervalle [0, 1]"
-    
-    plages_triees = sorted(plages.items())
-    for borne_sup, texte in plages_triees:
-        if valeur < borne_sup:
-            return texte
-    return plages_triees[-1][1]
+    return plage_sampler(plages).valeur(valeur)
 
 
-def generate_correlated_variable(var1, min_val1, max_val1, min_val2, max_val2):   
-    #selon étude corr patrimoine brut et revenu serait de 0.5
-    correlation=0.5
+#selon étude corr patrimoine brut et revenu serait de 0.5
+CORRELATION_PATRIMOINE_REVENU = 0.5
+
+def generate_correlated_variable(var1, min_val1, max_val1, min_val2, max_val2, correlation=CORRELATION_PATRIMOINE_REVENU):   
     # Normalisation de var1 pour qu'elle soit entre 0 et 1
     normalized_var1 = (var1 - min_val1) / (max_val1 - min_val1)
     
@@ -36,10 +82,25 @@ def generate_correlated_variable(var1, min_val1, max_val1, min_val2, max_val2):
     var2_normalized = expected_normalized_var2 + std_var * np.sqrt(1 - correlation**2)
     
     # Ajustement de la plage pour var2 en repassant par la fonction de répartition de la loi centré réduite
-    var2 = norm.cdf(var2_normalized) * (max_val2 - min_val2) + min_val2
+    # (ndtr est le ufunc de norm.cdf, sans le coût de la distribution figée scipy.stats)
+    var2 = ndtr(var2_normalized) * (max_val2 - min_val2) + min_val2
     
     return var2
 
+def generate_correlated_variable_array(var1, min_val1, max_val1, min_val2, max_val2,
+                                       correlation=CORRELATION_PATRIMOINE_REVENU, rng=None):
+    """Version tableau de generate_correlated_variable : un montant par élément de var1.
+
+    min_val2/max_val2 (et min_val1/max_val1) peuvent être des scalaires ou des
+    tableaux de même longueur que var1, pour des bornes différentes par ligne.
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    var1 = np.asarray(var1, dtype='float64')
+    normalized_var1 = (var1 - min_val1) / np.subtract(max_val1, min_val1)
+    std_var = rng.standard_normal(var1.shape)
+    var2_normalized = correlation * normalized_var1 + std_var * np.sqrt(1 - correlation**2)
+    return ndtr(var2_normalized) * np.subtract(max_val2, min_val2) + min_val2
+
 def list_item(a):
     resultat = []
     for libelle, count in a.items():
@@ -67,7 +128,8 @@ def list_type_auto(list_nb, plage_type, TYPES):
         if nb_type == 0:
             list_type[f"list{type_}"] = []
         else:
-            list_type[f"list{type_}"] = [valeur_en_fonction_de_plage(random.random(), plage_type[f"type{type_}"]) for i in range(nb_type)]
+            tirages = [random.random() for i in range(nb_type)]
+            list_type[f"list{type_}"] = plage_sampler(plage_type[f"type{type_}"]).tirer(tirages).tolist()
     return list_type
 
 
@@ -100,6 +162,8 @@ perso_plages={
     "regime_matrimonial_plages" : {0.85: 'communauté réduite aux acquêts', 1.0: 'séparation de biens'}
 }
 
+celib_plages = {0.30: True, 1.0: False}
+
 # Génération des valeurs aléatoires
 def situation_perso_random(perso_plages):
     civilite = valeur_en_fonction_de_plage(random.random(), perso_plages["civilite_plages"])
@@ -475,7 +539,7 @@ pro_plage_nb={
 pro_plage_type={
     "typeSte":{	1: "Société"},
     "typeSci":{	0.7: "SCI-Famille", 1.0: "SCI-Pro"},
-    "typeAutre":{0.50:"Fonds Commerce", 0.80:"Bien Exploitation",0.95:"CCA",  1.0:"Brevet"}
+    "typeAutres":{0.50:"Fonds Commerce", 0.80:"Bien Exploitation",0.95:"CCA",  1.0:"Brevet"}
 }
 									
 # Génération des valeurs aléatoires
@@ -556,10 +620,33 @@ emprunt_plage_type={
     "typePretAuto":{1:"Auto"},
     "typePretPro":{0.5:"Pro TxFixe", 0.7:"Pro TxFixe Différé", 0.8:"Pro TxFixe InFine", 0.90:"Pro TxVar",0.95:"Lease", 1.0:"CCA"}
 }
+#Durée restante en années : plage de tirage (mode auto) et durée fixe (montants saisis)
+emprunt_plage_duree={
+    "PretImmo":{"min": 2, "max": 25, "fixe": 20},
+    "PretConso":{"min": 1, "max": 5, "fixe": 5},
+    "PretAuto":{"min": 1, "max": 5, "fixe": 5},
+    "PretPro":{"min": 1, "max": 10, "fixe": 7}
+}
+#Types de prêt à durée imposée, quelle que soit la famille
+emprunt_duree_type={
+    "Immo PVH": 90
+}
+
+def date_fin_emprunt(annees, date_debut=None):
+    """Date de fin de chaque prêt : date_debut + annees (tableau), en arithmétique datetime64.
+
+    Même règle que relativedelta(years=...) : même mois et même jour, ramené au
+    dernier jour du mois s'il n'existe pas (29 février).
+    """
+    date_debut = np.datetime64(date_debut or datetime.now().date(), 'D')
+    mois_debut = date_debut.astype('datetime64[M]')
+    jour = (date_debut - mois_debut.astype('datetime64[D]')).astype('int64')
+    mois_fin = mois_debut + 12 * np.asarray(annees, dtype='int64')
+    jours_mois_fin = ((mois_fin + 1).astype('datetime64[D]') - mois_fin.astype('datetime64[D]')).astype('int64')
+    return mois_fin.astype('datetime64[D]') + np.minimum(jour, jours_mois_fin - 1)
 
 # Génération des emprunts de manière aléatoire
 def emprunt_random(mode, rand_immo, nb_emprunt=None, isCelib=True, cashflow_plages=None, rand_cashflow=None):
-    current_date = datetime.now()
     TYPES = ["PretImmo", "PretConso", "PretAuto","PretPro"]
     if mode == "manual":
         list_type = list_type_manual(nb_emprunt, TYPES)
@@ -570,6 +657,7 @@ def emprunt_random(mode, rand_immo, nb_emprunt=None, isCelib=True, cashflow_plag
         list_type = list_type_auto(list_nb, emprunt_plage_type, TYPES)
 
     emprunt = []
+    annees = []
     pct1 = 1 if isCelib else 0.5
     pct2 = 0 if isCelib else 0.5
     var1 = rand_cashflow['revenusActivite'][0]
@@ -580,6 +668,7 @@ def emprunt_random(mode, rand_immo, nb_emprunt=None, isCelib=True, cashflow_plag
         nb_type = list_nb[f"nb{type_}"]
         liste_types = list_type[f"list{type_}"]
         plage_montant = emprunt_plage_montant[f"montant{type_}"]
+        plage_duree = emprunt_plage_duree[type_]
         #Affecte aléatoirement les prêts immobilier
         if type_=="PretImmo":
             # Simuler les prêts immobiliers
@@ -604,22 +693,17 @@ def emprunt_random(mode, rand_immo, nb_emprunt=None, isCelib=True, cashflow_plag
                         var1, min_val1, max_val1, 
                         min_val2=plage_montant["min"], max_val2=plage_montant["max"]
                     )
-            if type_=="PretImmo":
-                dtFin = (current_date + relativedelta(years= random.randint(2, 25))).date()
-            elif type_=="PretPro":
-                dtFin = (current_date + relativedelta(years= random.randint(1, 10))).date()
-            else:
-                if typePret=="Immo PVH":
-                    dtFin = (current_date + relativedelta(years= 90)).date()
-                else: 
-                    dtFin = (current_date + relativedelta(years= random.randint(1, 5))).date()
-            emprunt.append((typePret, dtFin, montantPret, pct1, pct2, pretLie))
-            
-    return emprunt
+            annees.append(emprunt_duree_type.get(typePret) or random.randint(plage_duree["min"], plage_duree["max"]))
+            emprunt.append((typePret, montantPret, pct1, pct2, pretLie))
+
+    # dates de fin de tous les prêts en une passe
+    dtFin = date_fin_emprunt(annees)
+    return [(typePret, dtFin[i], montantPret, pct1, pct2, pretLie)
+            for i, (typePret, montantPret, pct1, pct2, pretLie) in enumerate(emprunt)]
 
 def emprunt_from_amounts(montants_emprunt, rand_immo, isCelib=True):
     emprunt = []
-    current_date = datetime.now()
+    annees = []
     pct1 = 1 if isCelib else 0.5
     pct2 = 0 if isCelib else 0.5
 
@@ -633,23 +717,115 @@ def emprunt_from_amounts(montants_emprunt, rand_immo, isCelib=True):
                             pretLie = 0
                             v = min(v, rand_immo['value'][pretLie])
 
-                        if type_ == "PretImmo":
-                            if sous_type == "Immo PVH":
-                                dtFin = (current_date + relativedelta(years=90)).date()
-                            else:
-                                dtFin = (current_date + relativedelta(years=20)).date()
-                        elif type_ == "PretPro":
-                            dtFin = (current_date + relativedelta(years=7)).date()
-                        else:
-                            dtFin = (current_date + relativedelta(years=5)).date()
+                        annees.append(emprunt_duree_type.get(sous_type)
+                                      or emprunt_plage_duree.get(type_, emprunt_plage_duree["PretConso"])["fixe"])
+                        emprunt.append((sous_type, v, pct1, pct2, pretLie))
+
+    dtFin = date_fin_emprunt(annees)
+    return [(sous_type, dtFin[i], v, pct1, pct2, pretLie)
+            for i, (sous_type, v, pct1, pct2, pretLie) in enumerate(emprunt)]
 
-                        emprunt.append((sous_type, dtFin, v, pct1, pct2, pretLie))
-    return emprunt
+
+################################
+##### CODES CATEGORIELS ####
+################################
+# Les libellés (typeProd, typeImmo, dispositif, typeBienPro, typeEmprunt) peuvent être
+# stockés en codes entiers int16 au lieu de champs U50 (200 octets par ligne et par champ).
+# Les codes renvoient à des vocabulaires figés au chargement du module, construits à
+# partir des tables de plages : un même libellé a le même code d'un processus à l'autre.
+# Le décodage en chaînes se fait dans impute_json au moment d'émettre le payload.
+
+class Vocabulaire:
+    """Liste ordonnée et figée de libellés ; le code d'un libellé est sa position."""
+
+    def __init__(self, libelles=()):
+        # doublons ignorés : un libellé garde le code de sa première occurrence
+        self.libelles = tuple(dict.fromkeys(libelles))
+        self.index = {libelle: code for code, libelle in enumerate(self.libelles)}
+        self._tableau = np.array(self.libelles, dtype='U50')
+
+    def code(self, libelle):
+        """Code du libellé ; ValueError s'il n'est pas dans le vocabulaire."""
+        try:
+            return self.index[libelle]
+        except KeyError:
+            raise ValueError(f"libellé hors vocabulaire : {libelle!r}") from None
+
+    def encoder(self, libelles):
+        uniques, inverse = np.unique(np.asarray(libelles, dtype=str), return_inverse=True)
+        codes = np.array([self.code(libelle) for libelle in uniques], dtype='int16')
+        return codes[inverse].reshape(np.shape(libelles))
+
+    def decoder(self, codes):
+        return self._tableau[codes]
+
+
+def _libelles(*tables):
+    return [libelle for table in tables for plages in table.values() for libelle in plages.values()]
+
+VOCABULAIRES = {
+    'typeProd': Vocabulaire(_libelles(fin_plage_type)),
+    'typeImmo': Vocabulaire(_libelles(immo_plage_type)),
+    'dispositif': Vocabulaire(["aucun"] + _libelles(immo_dispositif) + list(immo_dispositif_manual.values())),
+    'typeBienPro': Vocabulaire(_libelles(pro_plage_type)),
+    'typeEmprunt': Vocabulaire(_libelles(emprunt_plage_type))
+}
+
+# champs catégoriels de chaque section
+CHAMPS_CATEGORIELS = {
+    'fin': ['typeProd'],
+    'immo': ['typeImmo', 'dispositif'],
+    'pro': ['typeBienPro'],
+    'emprunt': ['typeEmprunt']
+}
+
+def _dtype_compact(dtype, champs):
+    return np.dtype([(nom, 'int16' if nom in champs else dtype.fields[nom][0]) for nom in dtype.names])
+
+fin_dtype_compact     = _dtype_compact(fin_dtype, CHAMPS_CATEGORIELS['fin'])
+immo_dtype_compact    = _dtype_compact(immo_dtype, CHAMPS_CATEGORIELS['immo'])
+pro_dtype_compact     = _dtype_compact(pro_dtype, CHAMPS_CATEGORIELS['pro'])
+emprunt_dtype_compact = _dtype_compact(emprunt_dtype, CHAMPS_CATEGORIELS['emprunt'])
+
+# section : (dtype libellés, dtype compact)
+DTYPES_SECTIONS = {
+    'fin': (fin_dtype, fin_dtype_compact),
+    'immo': (immo_dtype, immo_dtype_compact),
+    'pro': (pro_dtype, pro_dtype_compact),
+    'emprunt': (emprunt_dtype, emprunt_dtype_compact)
+}
+
+
+def encoder_section(arr, section):
+    """Convertit une section en dtype compact (codes int16) ; sans effet si déjà compacte."""
+    dtype, dtype_compact = DTYPES_SECTIONS[section]
+    if arr.dtype == dtype_compact:
+        return arr
+    compact = np.empty(len(arr), dtype=dtype_compact)
+    for nom in dtype.names:
+        compact[nom] = VOCABULAIRES[nom].encoder(arr[nom]) if nom in CHAMPS_CATEGORIELS[section] else arr[nom]
+    return compact
+
+
+def decoder_section(arr, section):
+    """Convertit une section compacte en dtype à libellés ; sans effet si déjà décodée."""
+    dtype, dtype_compact = DTYPES_SECTIONS[section]
+    if arr.dtype != dtype_compact:
+        return arr
+    decode = np.empty(len(arr), dtype=dtype)
+    for nom in dtype.names:
+        decode[nom] = VOCABULAIRES[nom].decoder(arr[nom]) if nom in CHAMPS_CATEGORIELS[section] else arr[nom]
+    return decode
+
+
+def decoder_client(p1):
+    return {section: decoder_section(arr, section) if section in DTYPES_SECTIONS else arr
+            for section, arr in p1.items()}
 
 
 def simul_obj_client(mode, nb_fin=None, nb_immo=None, nb_pro=None, nb_emprunt=None):
     # Exemple d'utilisation
-    isCelib = valeur_en_fonction_de_plage(random.random(), {0.30: True, 1.0: False})
+    isCelib = valeur_en_fonction_de_plage(random.random(), celib_plages)
     #perso
     perso=situation_perso_random(perso_plages)
     rand_perso = np.array(perso,dtype=perso_dtype)
@@ -715,6 +891,421 @@ def simul_obj_client_from_dicts(situation_dict, montants_fin, montants_immo, mon
     }
 
 
+################################
+##### GENERATION PAR LOT ####
+################################
+# Tirage vectorisé de N clients à la fois avec un np.random.Generator.
+# Chaque section est un seul tableau structuré (mêmes dtypes que simul_obj_client),
+# trié par client ; pat['owner'][section] donne l'indice du client de chaque ligne.
+
+SECTIONS_LIGNES = ['fin', 'immo', 'pro', 'emprunt']
+
+FIN_TYPES     = ["LivretA", "LDDS", "Cash", "CTO", "PEA", "Assurance",
+                 "Retraite", "EpargneSalariale", "Crypto", "Voiture", "Autres"]
+IMMO_TYPES    = ["RP", "RS", "RL", "SCPI", "Foret", "Terrain"]
+PRO_TYPES     = ["Ste", "Sci", "Autres"]
+EMPRUNT_TYPES = ["PretImmo", "PretConso", "PretAuto", "PretPro"]
+
+
+def _tirage_plage(rng, plages, size):
+    return plage_sampler(plages).sample(rng, size)
+
+
+def _tirage_codes(rng, plages, size, vocabulaire):
+    # tire directement les codes des libellés de la table (tous enregistrés dans VOCABULAIRES)
+    sampler = plage_sampler(plages)
+    codes = np.array([vocabulaire.code(libelle) for libelle in sampler._valeurs], dtype='int16')
+    return codes[sampler.indices(rng.random(size))]
+
+
+def situation_perso_batch(rng, n, perso_plages):
+    perso = np.empty(n, dtype=perso_dtype)
+    age = rng.integers(25, 71, size=n)
+    nb_enfants = _tirage_plage(rng, perso_plages["nb_enfants_plages"], n).astype('int32')
+    #ajuste nombre enfants à age
+    age_enfants = perso_plages["age_enfants"]
+    plafond = np.select(
+        [age < age_enfants[1], age < age_enfants[2], age < age_enfants[3], age < age_enfants[4]],
+        [0, 1, 2, 3], default=nb_enfants)
+    type_union = _tirage_plage(rng, perso_plages["type_union_plages"], n)
+    regime = _tirage_plage(rng, perso_plages["regime_matrimonial_plages"], n)
+
+    perso['Civilite'] = _tirage_plage(rng, perso_plages["civilite_plages"], n)
+    perso['Age'] = age
+    perso['nbEnfants'] = np.minimum(nb_enfants, plafond)
+    perso['typeUnion'] = type_union
+    perso['regimeMatrimonial'] = np.where(type_union == 'Marié(e)', regime, 'non applicable')
+    return perso
+
+
+def cashflow_batch(rng, cashflow_plages, isCelib, rand_perso):
+    n = len(rand_perso)
+    cashflow = np.empty(n, dtype=cashflow_dtype)
+    age_mere = rand_perso['Age']
+    nb_enfants = rand_perso['nbEnfants']
+    # nombre d'enfants de moins de 25 ans (l'enfant i a age_mere - age_enfants[i] ans)
+    nb_enfants_moins_25 = np.zeros(n, dtype='int32')
+    for i in range(1, 5):
+        nb_enfants_moins_25 += (nb_enfants >= i) & (age_mere - cashflow_plages['age_enfants'][i] < 25)
+    nb_part_fiscale = (1 + np.where(isCelib, 0, 1) + 0.5 * np.minimum(nb_enfants_moins_25, 2)
+                       + np.maximum(nb_enfants_moins_25 - 2, 0))
+    coef = cashflow_plages["coefRepartRevenu"]
+    coefRepartRevenu = np.where(isCelib, 1, rng.integers(coef["min"], coef["max"] + 1, size=n) / 100)
+    revenus = cashflow_plages["revenusActivite"]
+    pension = cashflow_plages["pensionRetraite"]
+    depenses = cashflow_plages["depensesCourantes"]
+    revenusActivite = np.where(age_mere >= 64, 0,
+                               coefRepartRevenu * rng.integers(revenus["min"], revenus["max"] + 1, size=n))
+    pensionRetraite = np.where(age_mere < 64, 0,
+                               coefRepartRevenu * rng.integers(pension["min"], pension["max"] + 1, size=n))
+
+    cashflow['revenusActivite'] = revenusActivite
+    cashflow['pensionRetraite'] = pensionRetraite
+    cashflow['depensesCourantes'] = rng.integers(depenses["min"], depenses["max"] + 1, size=n)
+    cashflow['revenusActiviteConjoint'] = revenusActivite * (1 - coefRepartRevenu) / coefRepartRevenu
+    cashflow['pensionRetraiteConjoint'] = pensionRetraite * (1 - coefRepartRevenu) / coefRepartRevenu
+    cashflow['nbPartFiscal'] = nb_part_fiscale
+    return cashflow
+
+
+def _lignes_batch(rng, TYPES, plage_nb, plage_type, n, vocabulaire, nb_max=None):
+    """Tire le nombre et le type de chaque ligne d'une section pour n clients.
+
+    Retourne (owner, famille, types) triés par client, les familles gardant
+    l'ordre de TYPES à l'intérieur d'un client comme dans *_random ; les types
+    sont des codes de `vocabulaire`.
+    """
+    owners, familles, types = [], [], []
+    for k, type_ in enumerate(TYPES):
+        nb = _tirage_plage(rng, plage_nb[f"nb{type_}"], n).astype('int64')
+        if nb_max is not None and type_ in nb_max:
+            nb = np.minimum(nb, nb_max[type_])
+        owner = np.repeat(np.arange(n), nb)
+        owners.append(owner)
+        familles.append(np.full(len(owner), k))
+        types.append(_tirage_codes(rng, plage_type[f"type{type_}"], len(owner), vocabulaire))
+    ordre = np.argsort(np.concatenate(owners), kind='stable')
+    return (np.concatenate(owners)[ordre], np.concatenate(familles)[ordre],
+            np.concatenate(types)[ordre])
+
+
+def _bornes_montant(TYPES, plage_montant, famille):
+    min_val2 = np.array([plage_montant[f"montant{type_}"]["min"] for type_ in TYPES], dtype='float64')
+    max_val2 = np.array([plage_montant[f"montant{type_}"]["max"] for type_ in TYPES], dtype='float64')
+    return min_val2[famille], max_val2[famille]
+
+
+def _rang_famille(owner, famille):
+    # rang d'une ligne parmi les lignes de même famille du même client (elles sont contiguës)
+    idx = np.arange(len(owner))
+    nouveau = np.ones(len(owner), dtype=bool)
+    nouveau[1:] = (owner[1:] != owner[:-1]) | (famille[1:] != famille[:-1])
+    return idx - np.maximum.accumulate(np.where(nouveau, idx, 0))
+
+
+def _debuts(owner, n):
+    # indice de la première ligne de chaque client dans une section triée par client
+    return np.searchsorted(owner, np.arange(n))
+
+
+################################
+##### COPULE GAUSSIENNE ####
+################################
+# Les montants d'un client sont tirés conjointement : une catégorie par
+# (section, famille), ex. "immo.RP" ou "emprunt.PretImmo". Chaque latent reprend la
+# construction de generate_correlated_variable (corrélation au revenu d'activité),
+# mais le bruit est tiré d'une normale multivariée de matrice `matrice`.
+# Avec la matrice identité on retrouve exactement le tirage indépendant.
+
+SECTIONS_TYPES = {
+    'fin': FIN_TYPES,
+    'immo': IMMO_TYPES,
+    'pro': PRO_TYPES,
+    'emprunt': EMPRUNT_TYPES
+}
+
+COPULE_CATEGORIES = [f"{section}.{type_}" for section, TYPES in SECTIONS_TYPES.items() for type_ in TYPES]
+
+# corrélations par paire entre catégories (les paires absentes valent 0)
+copule_correlations = {
+    ("immo.RP", "emprunt.PretImmo"): 0.6,
+    ("immo.RL", "emprunt.PretImmo"): 0.4,
+    ("immo.RS", "emprunt.PretImmo"): 0.3,
+    ("fin.PEA", "fin.CTO"): 0.5,
+    ("fin.PEA", "fin.Assurance"): 0.3,
+    ("fin.CTO", "fin.Assurance"): 0.3,
+    ("fin.LivretA", "fin.LDDS"): 0.4,
+    ("fin.LivretA", "fin.Cash"): 0.3,
+    ("fin.Retraite", "fin.EpargneSalariale"): 0.3,
+    ("fin.Voiture", "emprunt.PretAuto"): 0.5,
+    ("pro.Ste", "emprunt.PretPro"): 0.5,
+    ("pro.Sci", "emprunt.PretPro"): 0.3,
+    ("pro.Sci", "immo.SCPI"): 0.2
+}
+
+
+def matrice_copule(correlations, categories=COPULE_CATEGORIES):
+    """Construit la matrice de corrélation des catégories à partir des paires.
+
+    Une matrice non définie positive (paires incohérentes) est ramenée à la
+    matrice de corrélation définie positive la plus proche par écrêtage des valeurs propres.
+    """
+    index = {categorie: i for i, categorie in enumerate(categories)}
+    matrice = np.eye(len(categories))
+    for (cat1, cat2), rho in correlations.items():
+        matrice[index[cat1], index[cat2]] = rho
+        matrice[index[cat2], index[cat1]] = rho
+    valeurs_propres, vecteurs = np.linalg.eigh(matrice)
+    if valeurs_propres.min() < 1e-8:
+        matrice = (vecteurs * np.maximum(valeurs_propres, 1e-8)) @ vecteurs.T
+        diag = np.sqrt(np.diag(matrice))
+        matrice = matrice / np.outer(diag, diag)
+    return matrice
+
+
+class CopuleMontants:
+    """Copule gaussienne sur les montants de toutes les catégories d'actifs et de prêts."""
+
+    def __init__(self, correlations=copule_correlations, categories=COPULE_CATEGORIES,
+                 correlation_revenu=CORRELATION_PATRIMOINE_REVENU):
+        self.categories = list(categories)
+        self.index = {categorie: i for i, categorie in enumerate(self.categories)}
+        if isinstance(correlations, dict):
+            self.matrice = matrice_copule(correlations, self.categories)
+        else:
+            self.matrice = np.asarray(correlations, dtype='float64')
+        self.cholesky = np.linalg.cholesky(self.matrice)
+        self.correlation_revenu = correlation_revenu
+
+    def uniformes(self, rng, normalized_var1):
+        """Un vecteur de quantiles (n, nb catégories) par client, en un seul tirage multivarié."""
+        rho = self.correlation_revenu
+        bruit = rng.standard_normal((len(normalized_var1), len(self.categories))) @ self.cholesky.T
+        return ndtr(rho * normalized_var1[:, None] + bruit * np.sqrt(1 - rho**2))
+
+
+def _montants_copule(rng, copule, lignes, var1, cashflow_plages):
+    """Montants de toutes les lignes de toutes les sections via la copule.
+
+    lignes : {section: (owner, famille, plage_montant)}. La k-ième ligne d'une famille
+    d'un client utilise le k-ième vecteur tiré pour ce client, de sorte que chaque
+    ligne reste corrélée aux autres catégories du client.
+    """
+    normalized_var1 = ((var1 - cashflow_plages['revenusActivite']['min'])
+                       / (cashflow_plages['revenusActivite']['max'] - cashflow_plages['revenusActivite']['min']))
+    rangs = {section: _rang_famille(owner, famille) for section, (owner, famille, _) in lignes.items()}
+    rang_max = max([int(rang.max()) + 1 for rang in rangs.values() if len(rang)], default=0)
+    montants = {section: np.empty(len(owner)) for section, (owner, _, _) in lignes.items()}
+    for k in range(rang_max):
+        # seuls les clients ayant une k-ième ligne dans une famille sont tirés
+        clients = np.unique(np.concatenate([owner[rangs[section] == k]
+                                            for section, (owner, _, _) in lignes.items()]))
+        quantiles = copule.uniformes(rng, normalized_var1[clients])
+        for section, (owner, famille, plage_montant) in lignes.items():
+            masque = rangs[section] == k
+            TYPES = SECTIONS_TYPES[section]
+            colonnes = np.array([copule.index[f"{section}.{type_}"] for type_ in TYPES])[famille[masque]]
+            min_val2, max_val2 = _bornes_montant(TYPES, plage_montant, famille[masque])
+            u = quantiles[np.searchsorted(clients, owner[masque]), colonnes]
+            montants[section][masque] = u * (max_val2 - min_val2) + min_val2
+    return montants
+
+
+def simul_obj_client_batch(n, seed=None, cashflow_plages=cashflow_plages, perso_plages=perso_plages,
+                           correlation=CORRELATION_PATRIMOINE_REVENU, copule=None, compact=False):
+    """Génère n clients aléatoires d'un coup (équivalent vectorisé de simul_obj_client("auto")).
+
+    Sans copule, chaque montant est corrélé au seul revenu d'activité (comme *_random) ;
+    avec une CopuleMontants, les montants d'un client sont tirés conjointement.
+    Avec compact=True, les sections fin/immo/pro/emprunt sont en dtypes *_compact.
+    """
+    rng = np.random.default_rng(seed)
+    isCelib = _tirage_plage(rng, celib_plages, n).astype(bool)
+    pct1 = np.where(isCelib, 1, 0.5)
+    pct2 = np.where(isCelib, 0, 0.5)
+    #perso
+    rand_perso = situation_perso_batch(rng, n, perso_plages)
+    #cashflow
+    rand_cashflow = cashflow_batch(rng, cashflow_plages, isCelib, rand_perso)
+    var1 = rand_cashflow['revenusActivite']
+
+    #nombre et type des lignes de chaque section
+    owner_fin, famille_fin, types_fin = _lignes_batch(
+        rng, FIN_TYPES, fin_plage_nb, fin_plage_type, n, VOCABULAIRES['typeProd'])
+    owner_immo, famille_immo, types_immo = _lignes_batch(
+        rng, IMMO_TYPES, immo_plage_nb, immo_plage_type, n, VOCABULAIRES['typeImmo'])
+    owner_pro, famille_pro, types_pro = _lignes_batch(
+        rng, PRO_TYPES, pro_plage_nb, pro_plage_type, n, VOCABULAIRES['typeBienPro'])
+    # un prêt immo est lié à un bien distinct du client : leur nombre est plafonné
+    # au nombre de biens quand le client en a (random.sample dans emprunt_random)
+    nb_immo = np.bincount(owner_immo, minlength=n)
+    nb_max = {"PretImmo": np.where(nb_immo > 0, nb_immo, np.iinfo('int64').max)}
+    owner_emp, famille_emp, types_emp = _lignes_batch(
+        rng, EMPRUNT_TYPES, emprunt_plage_nb, emprunt_plage_type, n, VOCABULAIRES['typeEmprunt'], nb_max=nb_max)
+
+    #montants
+    lignes = {
+        'fin': (owner_fin, famille_fin, fin_plage_montant),
+        'immo': (owner_immo, famille_immo, immo_plage_montant),
+        'pro': (owner_pro, famille_pro, pro_plage_montant),
+        'emprunt': (owner_emp, famille_emp, emprunt_plage_montant)
+    }
+    if copule is None:
+        montants = {}
+        for section, (owner, famille, plage_montant) in lignes.items():
+            min_val2, max_val2 = _bornes_montant(SECTIONS_TYPES[section], plage_montant, famille)
+            montants[section] = generate_correlated_variable_array(
+                var1[owner], cashflow_plages['revenusActivite']['min'], cashflow_plages['revenusActivite']['max'],
+                min_val2, max_val2, correlation=correlation, rng=rng)
+    else:
+        montants = _montants_copule(rng, copule, lignes, var1, cashflow_plages)
+
+    #fin
+    rand_fin = np.empty(len(owner_fin), dtype=fin_dtype_compact)
+    rand_fin['typeProd'] = types_fin
+    rand_fin['value'] = montants['fin']
+    rand_fin['pctDetention'] = pct1[owner_fin]
+    rand_fin['pctDetentionConjoint'] = pct2[owner_fin]
+
+    #immo
+    dispositif = np.full(len(owner_immo), VOCABULAIRES['dispositif'].code("aucun"), dtype='int16')
+    for typeImmo, plages in immo_dispositif.items():
+        masque = types_immo == VOCABULAIRES['typeImmo'].code(typeImmo)
+        dispositif[masque] = _tirage_codes(rng, plages, int(masque.sum()), VOCABULAIRES['dispositif'])
+    rand_immo = np.empty(len(owner_immo), dtype=immo_dtype_compact)
+    rand_immo['typeImmo'] = types_immo
+    rand_immo['dispositif'] = dispositif
+    rand_immo['value'] = montants['immo']
+    rand_immo['pctDetention'] = pct1[owner_immo]
+    rand_immo['pctDetentionConjoint'] = pct2[owner_immo]
+
+    #pro
+    rand_pro = np.empty(len(owner_pro), dtype=pro_dtype_compact)
+    rand_pro['typeBienPro'] = types_pro
+    rand_pro['value'] = montants['pro']
+    rand_pro['pctDetention'] = pct1[owner_pro]
+    rand_pro['pctDetentionConjoint'] = pct2[owner_pro]
+
+    #emprunt
+    montants_emp = montants['emprunt']
+    debut_immo = _debuts(owner_immo, n)
+    est_immo = (famille_emp == EMPRUNT_TYPES.index("PretImmo")) & (nb_immo[owner_emp] > 0)
+    # rang du prêt immo parmi les prêts immo du client
+    rang = _rang_famille(owner_emp, famille_emp)
+    # permutation aléatoire des biens de chaque client
+    permutation = np.lexsort((rng.random(len(owner_immo)), owner_immo))
+    immo_lie = np.full(len(owner_emp), -1, dtype='int32')
+    ligne_immo = permutation[debut_immo[owner_emp[est_immo]] + rang[est_immo]]
+    immo_lie[est_immo] = ligne_immo - debut_immo[owner_emp[est_immo]]
+    montants_emp[est_immo] = np.minimum(montants_emp[est_immo], rand_immo['value'][ligne_immo])
+
+    # durée tirée dans la plage de la famille, sauf types à durée imposée
+    duree_min = np.array([emprunt_plage_duree[type_]["min"] for type_ in EMPRUNT_TYPES])
+    duree_max = np.array([emprunt_plage_duree[type_]["max"] for type_ in EMPRUNT_TYPES])
+    annees = rng.integers(duree_min[famille_emp], duree_max[famille_emp] + 1)
+    for typePret, duree in emprunt_duree_type.items():
+        annees[types_emp == VOCABULAIRES['typeEmprunt'].code(typePret)] = duree
+    rand_emprunt = np.empty(len(owner_emp), dtype=emprunt_dtype_compact)
+    rand_emprunt['typeEmprunt'] = types_emp
+    rand_emprunt['dtFin'] = date_fin_emprunt(annees)
+    rand_emprunt['montantRestantDu'] = montants_emp
+    rand_emprunt['pctEmprunt'] = pct1[owner_emp]
+    rand_emprunt['pctEmpruntConjoint'] = pct2[owner_emp]
+    rand_emprunt['ImmoLie'] = immo_lie
+
+    if not compact:
+        rand_fin = decoder_section(rand_fin, 'fin')
+        rand_immo = decoder_section(rand_immo, 'immo')
+        rand_pro = decoder_section(rand_pro, 'pro')
+        rand_emprunt = decoder_section(rand_emprunt, 'emprunt')
+
+    pat={
+        'perso': rand_perso,
+        'cashflow': rand_cashflow,
+        'fin': rand_fin,
+        'immo': rand_immo,
+        'pro': rand_pro,
+        'emprunt': rand_emprunt,
+        'owner': {
+            'fin': owner_fin,
+            'immo': owner_immo,
+            'pro': owner_pro,
+            'emprunt': owner_emp
+        }
+    }
+    return(pat)
+
+
+def client_from_batch(pat_batch, i):
+    """Extrait le client i d'un lot au format de simul_obj_client (utilisable par impute_json)."""
+    client = {
+        'perso': pat_batch['perso'][i:i+1],
+        'cashflow': pat_batch['cashflow'][i:i+1],
+    }
+    for section in SECTIONS_LIGNES:
+        owner = pat_batch['owner'][section]
+        debut, fin = np.searchsorted(owner, [i, i + 1])
+        client[section] = pat_batch[section][debut:fin]
+    return client
+
+
+################################
+##### POPULATION PARALLELE ####
+################################
+# Le découpage en lots ne dépend que de n et taille_lot : chaque lot reçoit le
+# même flux SeedSequence quel que soit le nombre de processus, et les lots sont
+# recollés dans l'ordre, donc une même graine donne la même population.
+
+TAILLE_LOT_POPULATION = 10000
+
+
+def concat_batches(lots):
+    """Recolle des lots de simul_obj_client_batch dans l'ordre, en décalant les indices clients."""
+    pat = {
+        'perso': np.concatenate([lot['perso'] for lot in lots]),
+        'cashflow': np.concatenate([lot['cashflow'] for lot in lots]),
+        'owner': {}
+    }
+    decalages = np.cumsum([0] + [len(lot['perso']) for lot in lots[:-1]])
+    for section in SECTIONS_LIGNES:
+        pat[section] = np.concatenate([lot[section] for lot in lots])
+        pat['owner'][section] = np.concatenate(
+            [lot['owner'][section] + decalage for lot, decalage in zip(lots, decalages)])
+    return pat
+
+
+def simul_lots(n, seed, taille_lot=TAILLE_LOT_POPULATION, **kwargs):
+    """Génère les lots de simul_population un par un (mêmes clients, mémoire bornée à un lot)."""
+    seed_seq = np.random.SeedSequence(seed)
+    for debut in range(0, n, taille_lot):
+        enfant, = seed_seq.spawn(1)
+        yield simul_obj_client_batch(min(taille_lot, n - debut), seed=enfant, **kwargs)
+
+
+def _simul_lot(args):
+    taille, seed_seq, kwargs = args
+    return simul_obj_client_batch(taille, seed=seed_seq, **kwargs)
+
+
+def simul_population(n, seed, workers=None, taille_lot=TAILLE_LOT_POPULATION, **kwargs):
+    """Génère n clients en lots indépendants répartis sur un pool de processus.
+
+    Chaque lot tire d'un enfant SeedSequence(seed).spawn(...) ; le résultat est
+    identique pour toute valeur de workers. kwargs est passé à simul_obj_client_batch.
+    """
+    nb_lots = max(1, -(-n // taille_lot))
+    tailles = [min(taille_lot, n - i * taille_lot) for i in range(nb_lots)]
+    enfants = np.random.SeedSequence(seed).spawn(nb_lots)
+    taches = [(taille, enfant, kwargs) for taille, enfant in zip(tailles, enfants)]
+    workers = min(workers or os.cpu_count() or 1, nb_lots)
+    if workers == 1:
+        lots = [_simul_lot(tache) for tache in taches]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            lots = list(pool.map(_simul_lot, taches))
+    return concat_batches(lots)
+
+
 def import_json(JSON_file_name: str):
     with open(JSON_file_name, 'r') as file:
         return json.load(file)
@@ -803,6 +1394,8 @@ def classifPro(st):
     return "4-Autre"
 
 def impute_json(input_vide, p1):
+    # les sections compactes (codes int16) sont décodées ici, à l'émission du payload
+    p1 = decoder_client(p1)
     #### impute client part ####
     client_rd   = p1["perso"]
     input_vide["Client"]["PatClientDetail"][0]={**copy.deepcopy(input_vide["Client"]["PatClientDetail"][0]),  # Copie propre du dictionnaire de base
@@ -890,4 +1483,137 @@ def impute_json(input_vide, p1):
             "ImmoLie":            row["ImmoLie"].item(),
             "dateValue":          datetime.today().strftime("%Y-%m-%d")}
         for row in emprunt_rd]
-        print("DONE imputing emprunt part")
\ No newline at end of file
+        print("DONE imputing emprunt part")
+
+
+################################
+##### IMPUTATION COMPILEE ####
+################################
+# (section du lot, bloc du payload, liste de détail)
+DETAILS_PAYLOAD = [
+    ('fin', "Fin", "PatFinDetail"),
+    ('immo', "Immo", "PatImmoDetail"),
+    ('pro', "Pro", "PatProDetail"),
+    ('emprunt', "Emprunt", "PatEmpruntDetail")
+]
+
+CHAMPS_CASHFLOW = ["revenusActivite", "pensionRetraite", "depensesCourantes",
+                   "revenusActiviteConjoint", "pensionRetraiteConjoint", "nbPartFiscal"]
+
+
+def _copie_structure(obj):
+    # copie les conteneurs et partage les scalaires (équivalent de deepcopy pour du JSON)
+    if isinstance(obj, dict):
+        return {cle: _copie_structure(valeur) for cle, valeur in obj.items()}
+    if isinstance(obj, list):
+        return [_copie_structure(valeur) for valeur in obj]
+    return obj
+
+
+class ImputeurJson:
+    """impute_json compilé : le gabarit (ex. json/vide_new.json) est analysé une seule fois.
+
+    build(p1) renvoie un nouveau payload identique à celui qu'impute_json produit sur
+    une copie fraîche du gabarit, sans deepcopy par ligne ni .item() par champ.
+    """
+
+    def __init__(self, input_vide):
+        self.gabarit = copy.deepcopy(input_vide)
+        # ligne de base de chaque liste de détail : les clés à valeur scalaire sont
+        # partagées telles quelles, seules les valeurs conteneurs sont recopiées par ligne
+        self.lignes_base = {}
+        for bloc, liste in [("Client", "PatClientDetail"), ("Cashflow", "PatCashflowDetail")] + \
+                [(bloc, liste) for _, bloc, liste in DETAILS_PAYLOAD]:
+            lignes = self.gabarit[bloc][liste]
+            base = lignes[0] if lignes else {}
+            mutables = [cle for cle, valeur in base.items() if isinstance(valeur, (dict, list))]
+            self.lignes_base[liste] = (base, mutables)
+        # squelette sans les lignes de détail fin/immo/pro/emprunt, recopié à chaque payload
+        self.squelette = copy.deepcopy(self.gabarit)
+        for _, bloc, liste in DETAILS_PAYLOAD:
+            self.squelette[bloc][liste] = []
+        self.classif = {'fin': {}, 'immo': {}, 'pro': {}, 'emprunt': {}}
+
+    def _ligne(self, liste, valeurs):
+        base, mutables = self.lignes_base[liste]
+        ligne = {**base, **valeurs}
+        for cle in mutables:
+            if cle not in valeurs:
+                ligne[cle] = copy.deepcopy(base[cle])
+        return ligne
+
+    def _categorie(self, section, libelle, classif):
+        categories = self.classif[section]
+        if libelle not in categories:
+            categories[libelle] = classif(libelle)
+        return categories[libelle]
+
+    def build(self, p1):
+        p1 = decoder_client(p1)
+        payload = _copie_structure(self.squelette)
+        date_value = datetime.today().strftime("%Y-%m-%d")
+
+        #### client ####
+        civilite, age, nbEnfants, typeUnion, _ = p1["perso"][0].tolist()
+        payload["Client"]["PatClientDetail"][0] = self._ligne("PatClientDetail", {
+            "civilite":          civilite,
+            "dateNaissance":     f'{2025-age}-01-01',
+            "nbEnfants":         nbEnfants,
+            "typeUnion":         typeUnion})
+
+        #### cashflow ####
+        payload["Cashflow"]["PatCashflowDetail"][0].update(
+            zip(CHAMPS_CASHFLOW, p1["cashflow"][CHAMPS_CASHFLOW][0].tolist()))
+
+        #### fin ####
+        payload["Fin"]["PatFinDetail"] = [
+            self._ligne("PatFinDetail", {
+                "typeProd":              typeProd,
+                "catProd":               self._categorie('fin', typeProd, classifFin),
+                "value":                 value,
+                "quotePart":             value,
+                "pctDetention":          pct1,
+                "pctDetentionConjoint":  pct2,
+                "dateValue":             date_value})
+            for typeProd, value, pct1, pct2 in p1["fin"].tolist()]
+
+        #### immo ####
+        payload["Immo"]["PatImmoDetail"] = [
+            self._ligne("PatImmoDetail", {
+                "typeImmo":             typeImmo,
+                "catImmo":              self._categorie('immo', typeImmo, classifImmo),
+                "dispositif":           dispositif,
+                "value":                value,
+                "quotePart":            value,
+                "pctDetention":         pct1,
+                "pctDetentionConjoint": pct2,
+                "dateValue":            date_value})
+            for typeImmo, dispositif, value, pct1, pct2 in p1["immo"].tolist()]
+
+        #### pro ####
+        payload["Pro"]["PatProDetail"] = [
+            self._ligne("PatProDetail", {
+                "typeBienPro":          typeBienPro,
+                "catBienPro":           self._categorie('pro', typeBienPro, classifPro),
+                "value":                value,
+                "quotePart":            value,
+                "pctDetention":         pct1,
+                "pctDetentionConjoint": pct2,
+                "dateValue":            date_value})
+            for typeBienPro, value, pct1, pct2 in p1["pro"].tolist()]
+
+        #### emprunt ####
+        payload["Emprunt"]["PatEmpruntDetail"] = [
+            self._ligne("PatEmpruntDetail", {
+                "typeEmprunt":        typeEmprunt,
+                "catEmprunt":         self._categorie('emprunt', typeEmprunt, classifEmprunt),
+                "dtFin":              dtFin.strftime("%Y-%m-%d"),
+                "montantRestantDu":   montant,
+                "quotePart":          montant,
+                "pctEmprunt":         pct1,
+                "pctEmpruntConjoint": pct2,
+                "ImmoLie":            immoLie,
+                "dateValue":          date_value})
+            for typeEmprunt, dtFin, montant, pct1, pct2, immoLie in p1["emprunt"].tolist()]
+
+        return payload
@@ -0,0 +1,156 @@
+import os
+import copy
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+import streamlit as st
+
+from helpers.cache import ReponseCache
+
+
+################################
+##### MAGASIN DE RESULTATS ####
+################################
+# Les réponses volumineuses (input_json, json_proj, json_synth...) sont rangées une
+# seule fois pour tout le processus, sérialisées, sous le sha256 de leur JSON
+# canonique : deux sessions qui obtiennent le même résultat partagent la même entrée.
+# st.session_state ne garde que la clé. Taille en mémoire bornée avec éviction LRU ;
+# les entrées évincées partent sur disque si KLEMO_STORE_DIR est défini (cache LRU
+# de helpers.cache), sinon elles sont perdues et la page demande de relancer.
+# Les derniers objets relus sont gardés décodés : un rerun qui réaffiche le même
+# résultat ne refait pas json.loads. Leur taille estimée compte dans le même budget
+# que les entrées sérialisées, et ils sont évincés en premier. L'objet renvoyé est
+# partagé entre les sessions, il ne doit pas être modifié (copy.deepcopy au besoin,
+# voir modifier).
+
+STORE_TAILLE_MAX = int(os.getenv("KLEMO_STORE_MO", "256")) * 1024 * 1024  # octets
+STORE_DOSSIER = os.getenv("KLEMO_STORE_DIR")
+# taille en mémoire d'un objet décodé, en multiple de son JSON (dicts, listes et
+# chaînes Python : environ 2,8 fois sur les bases json/t*.json)
+FACTEUR_DECODE = 3
+# taille et durée de vie des entrées débordées sur disque
+STORE_DISQUE_TAILLE_MAX = 1024 * 1024 * 1024  # octets
+STORE_DISQUE_TTL = 24 * 3600  # secondes
+
+
+def cle_resultat(objet):
+    canonique = json.dumps(objet, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonique.encode("utf-8")).hexdigest()
+
+
+class MagasinResultats:
+    """{clé de contenu: JSON sérialisé} en mémoire, LRU borné, débordement optionnel sur disque."""
+
+    def __init__(self, taille_max=STORE_TAILLE_MAX, dossier=STORE_DOSSIER):
+        self.taille_max = taille_max
+        self.disque = ReponseCache(dossier, STORE_DISQUE_TAILLE_MAX, STORE_DISQUE_TTL) if dossier else None
+        self._lock = threading.Lock()
+        self._memoire = OrderedDict()
+        # {clé: (objet décodé, taille estimée)}, LRU compté dans octets
+        self._decodes = OrderedDict()
+        self.octets = 0
+        self.dedupliques = 0
+        self.evinces = 0
+
+    def mettre(self, objet):
+        """Range objet et renvoie sa clé ; un contenu déjà présent n'est pas dupliqué."""
+        cle = cle_resultat(objet)
+        with self._lock:
+            if cle in self._memoire:
+                self._memoire.move_to_end(cle)
+                self.dedupliques += 1
+                return cle
+        contenu = json.dumps(objet, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        self._ranger(cle, contenu)
+        return cle
+
+    def lire(self, cle):
+        """Objet rangé sous cle (partagé, à ne pas modifier), ou None s'il a été évincé (et pas débordé sur disque)."""
+        with self._lock:
+            contenu = self._memoire.get(cle)
+            if contenu is not None:
+                self._memoire.move_to_end(cle)
+                if cle in self._decodes:
+                    self._decodes.move_to_end(cle)
+                    return self._decodes[cle][0]
+        if contenu is not None:
+            objet = json.loads(contenu)
+        elif self.disque is None:
+            return None
+        else:
+            objet = self.disque.get(cle)
+            if objet is None:
+                return None
+            # de retour en mémoire : c'est à nouveau l'entrée la plus récente
+            self._ranger(cle, json.dumps(objet, separators=(",", ":"), ensure_ascii=False).encode("utf-8"))
+        self._garder_decode(cle, objet)
+        return objet
+
+    def _garder_decode(self, cle, objet):
+        with self._lock:
+            # une entrée évincée entre-temps n'est pas gardée décodée
+            if cle not in self._memoire or cle in self._decodes:
+                return
+            taille = len(self._memoire[cle]) * FACTEUR_DECODE
+            self._decodes[cle] = (objet, taille)
+            self.octets += taille
+            evinces = self._evincer()
+        self._deborder(evinces)
+
+    def _ranger(self, cle, contenu):
+        with self._lock:
+            if cle not in self._memoire:
+                self._memoire[cle] = contenu
+                self.octets += len(contenu)
+            self._memoire.move_to_end(cle)
+            evinces = self._evincer()
+        self._deborder(evinces)
+
+    def _evincer(self):
+        """Sous self._lock : objets décodés puis entrées sérialisées les plus anciens, jusqu'au budget."""
+        while self.octets > self.taille_max and self._decodes:
+            self.octets -= self._decodes.popitem(last=False)[1][1]
+        evinces = []
+        while self.octets > self.taille_max and len(self._memoire) > 1:
+            ancienne, ancien_contenu = self._memoire.popitem(last=False)
+            self.octets -= len(ancien_contenu)
+            self.evinces += 1
+            evinces.append((ancienne, ancien_contenu))
+        return evinces
+
+    def _deborder(self, evinces):
+        # écriture disque hors verrou
+        if self.disque is not None:
+            for ancienne, ancien_contenu in evinces:
+                self.disque.put(ancienne, json.loads(ancien_contenu))
+
+    def stats(self):
+        with self._lock:
+            return {"entrees": len(self._memoire), "octets": self.octets, "decodes": len(self._decodes),
+                    "dedupliques": self.dedupliques, "evinces": self.evinces,
+                    "disque": self.disque.stats() if self.disque is not None else None}
+
+
+# magasin unique du processus
+STORE = MagasinResultats()
+
+
+def garder(nom, objet):
+    """Range objet dans STORE et n'en garde que la clé dans st.session_state (None efface)."""
+    st.session_state[f"cle_{nom}"] = STORE.mettre(objet) if objet is not None else None
+
+
+def modifier(nom):
+    """Copie modifiable de l'objet nom (l'original du magasin est partagé), à ranger ensuite avec garder."""
+    return copy.deepcopy(reprendre(nom))
+
+
+def reprendre(nom, defaut=None):
+    """Objet dont la clé est dans st.session_state, ou defaut s'il n'y en a pas ou s'il a été évincé."""
+    cle = st.session_state.get(f"cle_{nom}")
+    if cle is None:
+        return defaut
+    objet = STORE.lire(cle)
+    return defaut if objet is None else objet
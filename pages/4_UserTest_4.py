@@ -3,6 +3,8 @@ import json
 import requests
 from helpers.auth import check_password
 from helpers import func
+from helpers import jobs
+from helpers import store
 from datetime import datetime
 
 if not check_password():
@@ -11,73 +13,54 @@ if not check_password():
 st.title("♟️ Test Utilisateur 4")
 
 # --- Step 1: Initialize session_state ---
-if "base_t4" not in st.session_state:
-    st.session_state.base_t4 = func.load_base_info("t4")
+# la base du persona est rangée dans helpers.store, la session n'en garde que la clé
+if store.reprendre("base_t4") is None:
+    store.garder("base_t4", func.load_base_info("t4"))
+base_t4 = store.reprendre("base_t4")
 
 # --- Step 2: Show editable section ---
 with st.expander("👤 Information", expanded=True):
-    st.write("ID User:", st.session_state.base_t4["Client"]["PatClientDetail"][0]["id"])
-    st.write("Statut Pro User:", st.session_state.base_t4["Client"]["PatClientDetail"][0]["statutPro"])
+    st.write("ID User:", base_t4["Client"]["PatClientDetail"][0]["id"])
+    st.write("Statut Pro User:", base_t4["Client"]["PatClientDetail"][0]["statutPro"])
     st.write("Objectif du client est de financer un projet immo sans préciser le montant du projet")
 
     col1,col2,col3  = st.columns(3)
 
     with col1:
-        age = st.number_input("Mon Age", min_value=18, max_value=100, value=datetime.today().year - int(st.session_state.base_t4["Client"]["PatClientDetail"][0]["dateNaissance"][:4]))
-        situation = st.selectbox("Ma Situation Personnelle", ["Célibataire", "Union Libre", "Pacsé(e)", "Marié(e)"], index=["Célibataire", "Union Libre", "Pacsé(e)", "Marié(e)"].index(st.session_state.base_t4["Client"]["PatClientDetail"][0]["typeUnion"]))
+        age = st.number_input("Mon Age", min_value=18, max_value=100, value=datetime.today().year - int(base_t4["Client"]["PatClientDetail"][0]["dateNaissance"][:4]))
+        situation = st.selectbox("Ma Situation Personnelle", ["Célibataire", "Union Libre", "Pacsé(e)", "Marié(e)"], index=["Célibataire", "Union Libre", "Pacsé(e)", "Marié(e)"].index(base_t4["Client"]["PatClientDetail"][0]["typeUnion"]))
 
     with col2:
-        charge = st.number_input("Mes dépenses courantes/mo (€)", min_value=0, step=100, value=int(st.session_state.base_t4["Cashflow"]["PatCashflowDetail"][0]["depensesCourantes"]))
-        loyer = st.number_input("Mon loyer mensuel (€)", min_value=0, step=100, value=int(st.session_state.base_t4["Cashflow"]["PatCashflowDetail"][0]["loyerHabitationPrincipale"]))
+        charge = st.number_input("Mes dépenses courantes/mo (€)", min_value=0, step=100, value=int(base_t4["Cashflow"]["PatCashflowDetail"][0]["depensesCourantes"]))
+        loyer = st.number_input("Mon loyer mensuel (€)", min_value=0, step=100, value=int(base_t4["Cashflow"]["PatCashflowDetail"][0]["loyerHabitationPrincipale"]))
 
     with col3:
-        fin = st.number_input("Mon LivretA vaut (€)", min_value=0, step=1000, value=int(st.session_state.base_t4["Fin"]["PatFinDetail"][0]["value"]))
-        salaire = st.number_input("Mon salaire brut annuel (€)", min_value=0, step=1000, value=int(st.session_state.base_t4["Cashflow"]["PatCashflowDetail"][0]["revenusActivite"])) 
+        fin = st.number_input("Mon LivretA vaut (€)", min_value=0, step=1000, value=int(base_t4["Fin"]["PatFinDetail"][0]["value"]))
+        salaire = st.number_input("Mon salaire brut annuel (€)", min_value=0, step=1000, value=int(base_t4["Cashflow"]["PatCashflowDetail"][0]["revenusActivite"])) 
     
     # Save modifications
     if st.button("💾 Enregistrer"):
-        st.session_state.base_t4["Client"]["PatClientDetail"][0]["dateNaissance"] = f"{datetime.today().year - age}-01-01"
-        st.session_state.base_t4["Client"]["PatClientDetail"][0]["typeUnion"] = situation
-        st.session_state.base_t4["Fin"]["PatFinDetail"][0]["value"] = fin
-        st.session_state.base_t4["Fin"]["PatFinDetail"][0]["quotePart"] = fin
-        st.session_state.base_t4["Cashflow"]["PatCashflowDetail"][0]["loyerHabitationPrincipale"] = loyer
-        st.session_state.base_t4["Cashflow"]["PatCashflowDetail"][0]["depensesCourantes"] = charge
-        st.session_state.base_t4["Cashflow"]["PatCashflowDetail"][0]["revenusActivite"] = salaire
+        # copie modifiable : l'objet du magasin est partagé entre les sessions
+        base_t4 = store.modifier("base_t4")
+        base_t4["Client"]["PatClientDetail"][0]["dateNaissance"] = f"{datetime.today().year - age}-01-01"
+        base_t4["Client"]["PatClientDetail"][0]["typeUnion"] = situation
+        base_t4["Fin"]["PatFinDetail"][0]["value"] = fin
+        base_t4["Fin"]["PatFinDetail"][0]["quotePart"] = fin
+        base_t4["Cashflow"]["PatCashflowDetail"][0]["loyerHabitationPrincipale"] = loyer
+        base_t4["Cashflow"]["PatCashflowDetail"][0]["depensesCourantes"] = charge
+        base_t4["Cashflow"]["PatCashflowDetail"][0]["revenusActivite"] = salaire
         
+        store.garder("base_t4", base_t4)
         with open("json/t4.json", "w", encoding="utf-8") as f:
-            json.dump(st.session_state.base_t4, f, ensure_ascii=False, indent=4)
+            json.dump(base_t4, f, ensure_ascii=False, indent=4)
         st.success(f"✅ Info Enregistrée")
 
 
 # --- Step 2: Show editable section ---
 with st.expander("🕒 BILAN KLEMO", expanded=True):
-
-    if st.button("LANCER LA SIMULATION KLEMO"):
-        
-        json_proj, time_elapsed = func.call_api(st.session_state.base_t4,func.FILL_SCORE_URL)
-        st.session_state.json_proj = json_proj["output"]
-        
-        json_synth, time_elapsed = func.call_api(st.session_state.json_proj,func.PROJ_URL)
-        
-        st.session_state.json_synth = json_synth
-                   
-        st.session_state.json_synth_id = json_synth["requestId"]
-        st.session_state.json_synth_key = json_synth["requestKey"]
-        
-        st.session_state.simulation_ready = True
-        st.success("✅ Simulation Bilan exécutée avec succès !")
-
-        # st.subheader(f"Temps de réponse BilanPat: {time_elapsed} secondes")
-                # st.write(f"Résultats json enregistrés dans un bucket s3 avec suffix:{json_synth['requestKey']}")
-
-    if "simulation_ready" in st.session_state and st.session_state.simulation_ready:
-        func.display_bilan_synth(st.session_state.json_synth)
-    else:
-        st.info("👉 Cliquez sur **LANCER LA SIMULATION KLEMO** pour commencer.")
+    jobs.section_bilan(base_t4)
 
 st.subheader("💡 RECOS KLEMO")
-if 'json_synth_id' not in st.session_state:
-    st.session_state.json_synth_id = None
 
 with st.expander("📝 FORMULAIRE OBJECTIF", expanded=True):
         # Text area for the next API call
@@ -108,29 +91,8 @@ with st.expander("📝 FORMULAIRE OBJECTIF", expanded=True):
     
     paramObj = st.text_area(":black_nib: entrer des paramètres d'objectif (optionnel):",value='{}', height=200)
     
-if st.button("LANCER SIMULATION RECOS KLEMO"):
-    # Build the payload
-    st.session_state.payload_strat = {
-        "requestId": st.session_state.json_synth_id, 
-        "requestKey": st.session_state.json_synth_key,
-        "objectif": func.MAPPINGS_OBJECTIF_CHOICES[selected_objectif],
-        "sousObjectif": func.MAPPINGS_OBJECTIF_CHOICES[selected_sous_objectif],
-        "paramObjectif": json.loads(paramObj),
-        "investorProfile":{"level":"Balanced","esg":"Neutral"}
-    }
-
-# json_proj = json.loads(json_proj)
-# if st.button("Send Request to our API StratPat"):
-    if st.session_state.json_synth_id: 
-        # Call the API with the parsed JSON
-        init_strat, time_elapsed = func.call_api(st.session_state.payload_strat,func.STRAT_INIT_URL)
-
-        if init_strat:
-            request_id     = st.session_state.payload_strat.get("requestId")
-            strat_result   = func.poll_result(func.STRAT_URL,request_id)
-            print("debugging: strat_result",strat_result)
-            strat_output = strat_result.json()["output"]
-            func.display_strat_output(selected_objectif,selected_sous_objectif, st.session_state.payload_strat, strat_output,5)
+investor_profile = {"level":"Balanced","esg":"Neutral"}
+jobs.section_recos(paramObj, investor_profile, selected_objectif, selected_sous_objectif)
 
 # streamlit, pre-save a json, show in a pliable section base info: age, situation, emprunt, give possibility to change it and save to state session, then add a button to launch a api call
 
@@ -0,0 +1,23 @@
+import streamlit as st
+from helpers.auth import check_password
+from helpers import func
+from helpers.store import STORE
+from helpers.metrics import panneau_latences, panneau_vols
+
+if not check_password():
+    st.stop()
+
+st.title("⏱️ Latences API")
+st.caption("Temps mur, temps serveur, octets et relances par endpoint, y compris polling strat_result et rendu des pages.")
+if func.api_client.vols is not None:
+    st.subheader("✈️ Appels en vol")
+    panneau_vols(func.api_client.vols)
+panneau_latences()
+
+st.subheader("🗄️ Magasin de résultats")
+stats_store = STORE.stats()
+colonnes = st.columns(4)
+colonnes[0].metric("Entrées", stats_store["entrees"])
+colonnes[1].metric("Mémoire (Mo)", round(stats_store["octets"] / 1024 ** 2, 1))
+colonnes[2].metric("Dédupliqués", stats_store["dedupliques"], help="résultats identiques partagés entre sessions")
+colonnes[3].metric("Évincés", stats_store["evinces"])
@@ -4,30 +4,12 @@ import requests
 from helpers.auth import check_password
 from helpers import func
 from datetime import datetime
-import boto3
-from requests_aws4auth import AWS4Auth
 import pandas as pd
 import plotly.express as px
 
 if not check_password():
     st.stop()
 
-aws_access_key, aws_secret_key, aws_region = func.get_aws_credentials()
-session     = boto3.Session(aws_access_key_id=aws_access_key,
-                            aws_secret_access_key=aws_secret_key,
-                            region_name = aws_region)
-
-credentials = session.get_credentials()
-
-auth = AWS4Auth(
-    credentials.access_key,
-    credentials.secret_key,
-    aws_region,
-    'execute-api',
-    session_token=credentials.token
-)
-
-
 def call_api_sous(json_payload,api_url):
     """
     call api function 
@@ -35,7 +17,7 @@ def call_api_sous(json_payload,api_url):
     try:
         payload_ini = json.dumps(json_payload)
         # st.write(f"Calling API at {api_url} with payload: {payload_ini[:40]}...")  # Debugging information
-        response = requests.post(api_url, data = payload_ini, auth = auth)
+        response = func.api_client.post(api_url, data = payload_ini)
         response.raise_for_status()  # Raise an error for bad responses
         # if 'output' in response.json().keys():
             # st.write(f"API Response having following keys: {list(response.json()['output'].keys())[-4:]}...")
@@ -0,0 +1,29 @@
+import pytest
+
+from helpers import func
+from helpers.api_client import KlemoApiClient
+from helpers.mock_server import MockKlemoServer
+
+# polling rapide : le serveur simulé répond sans latence
+POLL_RAPIDE = {"premier": 0.01, "facteur": 1.5, "max": 0.05, "jitter": 0.0, "deadline": 10.0}
+
+
+@pytest.fixture
+def api_simulee(monkeypatch):
+    """func branché sur un MockKlemoServer local, sans signature ni cache disque."""
+    serveur = MockKlemoServer(("127.0.0.1", 0), polls=2)
+    base = serveur.start()
+    client = KlemoApiClient(None, timeouts=func.API_TIMEOUTS)
+    monkeypatch.setattr(func, "api_client", client)
+    monkeypatch.setattr(func, "api_cache", None)
+    monkeypatch.setattr(func, "API_LOCALE", True)
+    monkeypatch.setattr(func, "POLL_SCHEDULE", POLL_RAPIDE)
+    for nom, chemin in [("API_BASE_URL", ""), ("FILL_SCORE_URL", "/fill-score"), ("PROJ_URL", "/proj"),
+                        ("STRAT_URL", ""), ("STRAT_INIT_URL", "/strat_init"),
+                        ("STRAT_RESULT_URL", "/strat_result")]:
+        monkeypatch.setattr(func, nom, base + chemin)
+    monkeypatch.setattr(func, "COALESCENCE_ENDPOINTS", (base + "/fill-score",))
+    yield serveur
+    client.close()
+    serveur.shutdown()
+    serveur.server_close()
@@ -0,0 +1,122 @@
+import threading
+
+import pytest
+
+from helpers import func
+from helpers.api_client import VolsEnCours
+
+
+def _lancer(vols, nb, cle, fn):
+    """nb appels concurrents de même clé : [(résultat, meneur ?) ou exception]."""
+    resultats = [None] * nb
+
+    def appel(i):
+        try:
+            resultat, vol = vols.executer(cle, fn)
+            resultats[i] = (resultat, vol is not None)
+        except Exception as e:
+            resultats[i] = e
+
+    threads = [threading.Thread(target=appel, args=(i,)) for i in range(nb)]
+    for thread in threads:
+        thread.start()
+    return threads, resultats
+
+
+def _attendre_suiveurs(vols, nb):
+    # les suiveurs sont comptés avant d'attendre le meneur
+    for _ in range(500):
+        if vols.stats()["appels"] >= nb:
+            return
+        threading.Event().wait(0.01)
+    raise AssertionError("appels concurrents non arrivés")
+
+
+def test_suiveurs_partagent_le_resultat_du_meneur():
+    vols = VolsEnCours()
+    lacher = threading.Event()
+    nb_fn = []
+
+    def fn():
+        nb_fn.append(1)
+        lacher.wait(5)
+        return {"output": 42}
+
+    threads, resultats = _lancer(vols, 5, "cle", fn)
+    _attendre_suiveurs(vols, 5)
+    assert vols.stats()["en_vol"] == 1
+    lacher.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(nb_fn) == 1
+    assert [meneur for _, meneur in resultats].count(True) == 1
+    assert all(resultat == {"output": 42} for resultat, _ in resultats)
+    assert vols.stats() == {"en_vol": 0, "max_en_vol": 1, "appels": 5, "coalesces": 4}
+
+
+def test_erreur_du_meneur_propagee_aux_suiveurs():
+    vols = VolsEnCours()
+    lacher = threading.Event()
+
+    def fn():
+        lacher.wait(5)
+        raise ConnectionError("api indisponible")
+
+    threads, resultats = _lancer(vols, 3, "cle", fn)
+    _attendre_suiveurs(vols, 3)
+    lacher.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert all(isinstance(resultat, ConnectionError) for resultat in resultats)
+    assert vols.stats()["en_vol"] == 0
+    # la clé est oubliée : l'appel suivant est de nouveau meneur
+    resultat, vol = vols.executer("cle", lambda: "ok")
+    assert resultat == "ok" and vol is not None
+
+
+def test_cles_distinctes_comptees_en_vol():
+    vols = VolsEnCours()
+    lacher = threading.Event()
+    threads = []
+    for cle in ("a", "b", "c"):
+        t, _ = _lancer(vols, 1, cle, lambda: lacher.wait(5))
+        threads += t
+    _attendre_suiveurs(vols, 3)
+    assert vols.stats()["en_vol"] == 3
+    lacher.set()
+    for thread in threads:
+        thread.join(5)
+    stats = vols.stats()
+    assert stats["max_en_vol"] == 3
+    assert stats["coalesces"] == 0
+    assert stats["en_vol"] == 0
+
+
+def test_appel_apres_vol_non_coalesce():
+    vols = VolsEnCours()
+    assert vols.executer("cle", lambda: 1)[0] == 1
+    resultat, vol = vols.executer("cle", lambda: 2)
+    assert resultat == 2 and vol is not None
+    assert vols.stats()["coalesces"] == 0
+
+
+class _ClientEspion:
+    """Remplace func.api_client : garde la clé de coalescence de chaque POST."""
+
+    def __init__(self):
+        self.cles = []
+
+    def post(self, url, data=None, cle=None):
+        self.cles.append(cle)
+        raise func.requests.exceptions.ConnectionError("pas de réseau dans les tests")
+
+
+@pytest.mark.parametrize("url, partage", [(func.FILL_SCORE_URL, True), (func.PROJ_URL, False),
+                                          (func.STRAT_INIT_URL, False)])
+def test_coalescence_limitee_a_fill_score(monkeypatch, url, partage):
+    espion = _ClientEspion()
+    monkeypatch.setattr(func, "api_client", espion)
+    assert func.call_api({"persona": 1}, url, use_cache=False) == (None, None)
+    assert (espion.cles[0] is not None) is partage
@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from helpers.aws_credentials import DELAI_MIN_RENOUVELLEMENT, FournisseurAuthAWS
+
+
+def _planifie(credentials, marge=600):
+    fournisseur = FournisseurAuthAWS(marge=marge)
+    fournisseur._credentials = credentials
+    fournisseur._planifier()
+    if fournisseur._timer is None:
+        return None
+    fournisseur._timer.cancel()
+    return fournisseur._timer.interval
+
+
+@pytest.mark.parametrize("credentials", [
+    SimpleNamespace(),                                          # identifiants statiques
+    SimpleNamespace(_expiry_time=None),
+    SimpleNamespace(_expiry_time="2030-01-01T00:00:00Z"),      # type inattendu
+    SimpleNamespace(_expiry_time=datetime(2030, 1, 1)),         # sans fuseau
+])
+def test_sans_expiration_exploitable_pas_de_timer(credentials):
+    assert _planifie(credentials) is None
+
+
+def test_renouvellement_avant_expiration():
+    expiration = datetime.now(timezone.utc) + timedelta(hours=1)
+    assert _planifie(SimpleNamespace(_expiry_time=expiration)) == pytest.approx(3000, abs=5)
+
+
+@pytest.mark.parametrize("dans", [timedelta(minutes=5), timedelta(minutes=-5)])
+def test_expiration_dans_la_marge_delai_minimal(dans):
+    expiration = datetime.now(timezone.utc) + dans
+    assert _planifie(SimpleNamespace(_expiry_time=expiration)) == DELAI_MIN_RENOUVELLEMENT
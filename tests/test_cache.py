@@ -0,0 +1,56 @@
+import os
+
+from helpers import cache
+from helpers.cache import ReponseCache, cle_cache
+
+
+def test_cle_independante_de_l_ordre_des_cles():
+    assert cle_cache("/proj", {"a": 1, "b": 2}) == cle_cache("/proj", {"b": 2, "a": 1})
+    assert cle_cache("/proj", {"a": 1}) != cle_cache("/fill-score", {"a": 1})
+
+
+def test_hit_miss(tmp_path):
+    reponses = ReponseCache(str(tmp_path))
+    assert reponses.get("cle") is None
+    reponses.put("cle", {"output": 1})
+    assert reponses.get("cle") == {"output": 1}
+    assert reponses.stats()["hits"] == 1 and reponses.stats()["misses"] == 1
+
+
+def test_expiration_ttl(tmp_path, monkeypatch):
+    horloge = [1000.0]
+    monkeypatch.setattr(cache.time, "time", lambda: horloge[0])
+    reponses = ReponseCache(str(tmp_path), ttl=60)
+    reponses.put("cle", {"output": 1})
+    horloge[0] += 59
+    assert reponses.get("cle") == {"output": 1}
+    horloge[0] += 61
+    assert reponses.get("cle") is None
+    # l'entrée expirée est supprimée du disque
+    assert reponses.stats()["entrees"] == 0
+    assert not os.listdir(tmp_path)
+
+
+def test_eviction_lru(tmp_path, monkeypatch):
+    horloge = [1000.0]
+    monkeypatch.setattr(cache.time, "time", lambda: horloge[0])
+    reponse = {"output": "x" * 100}
+    reponses = ReponseCache(str(tmp_path))
+    reponses.put("a", reponse)
+    taille = reponses.stats()["octets"]
+    reponses.taille_max = 2 * taille
+    horloge[0] += 1
+    reponses.put("b", reponse)
+    horloge[0] += 1
+    # relire a le rend plus récent que b
+    assert reponses.get("a") == reponse
+    horloge[0] += 1
+    reponses.put("c", reponse)
+    assert reponses.get("b") is None
+    assert reponses.get("a") == reponse and reponses.get("c") == reponse
+    assert reponses.stats()["octets"] <= reponses.taille_max
+
+
+def test_index_reconstruit_depuis_le_disque(tmp_path):
+    ReponseCache(str(tmp_path)).put("cle", {"output": 1})
+    assert ReponseCache(str(tmp_path)).get("cle") == {"output": 1}
@@ -0,0 +1,44 @@
+import threading
+
+from helpers import func
+
+
+def _lancer_strat(request_id):
+    payload = {"requestId": request_id, "objectif": "completer", "sousObjectif": "revenus_supplementaires"}
+    init_strat, _ = func.call_api(payload, func.STRAT_INIT_URL, use_cache=False)
+    assert init_strat is not None
+
+
+def test_poll_jusqu_au_resultat(api_simulee):
+    _lancer_strat("r1")
+    reponse = func.poll_result(func.STRAT_URL, "r1")
+    assert reponse is not None and reponse.status_code == 200
+    # polls=2 : deux 202 puis le résultat
+    assert reponse.poll_count == api_simulee.polls + 1
+    assert reponse.json()["output"]
+
+
+def test_intervalles_croissants_plafonnes(api_simulee, monkeypatch):
+    attentes = []
+    # time.sleep est partagé avec les threads du serveur simulé : seules les attentes du poller comptent
+    principal = threading.current_thread()
+    monkeypatch.setattr(func.time, "sleep",
+                        lambda s: attentes.append(s) if threading.current_thread() is principal else None)
+    api_simulee.polls = 5
+    _lancer_strat("r2")
+    schedule = {"premier": 0.2, "facteur": 2.0, "max": 1.0, "jitter": 0.0, "deadline": 30.0}
+    reponse = func.poll_result(func.STRAT_URL, "r2", schedule)
+    assert reponse.poll_count == 6
+    assert attentes == [0.2, 0.4, 0.8, 1.0, 1.0, 1.0]
+
+
+def test_deadline_depassee(api_simulee):
+    api_simulee.polls = 10 ** 6
+    _lancer_strat("r3")
+    assert func.poll_result(func.STRAT_URL, "r3", {"deadline": 0.2}) is None
+
+
+def test_erreur_arrete_le_polling(api_simulee):
+    # requestId inconnu du serveur : 404, pas de nouvel essai
+    assert func.poll_result(func.STRAT_URL, "inconnu") is None
+    assert api_simulee.nb_requetes["strat_result"] == 1
@@ -0,0 +1,60 @@
+import copy
+
+import pytest
+
+from helpers.simul_contraint_main_sous_cat_v2 import (
+    ImputeurJson, client_from_batch, impute_json, import_json, simul_obj_client_batch,
+    simul_obj_client_from_dicts)
+from helpers.jsonGen import montants_emprunt, montants_fin, montants_immo, montants_pro, situation_dict
+
+GABARIT = "json/vide_new.json"
+
+
+@pytest.fixture(scope="module")
+def gabarit():
+    return import_json(GABARIT)
+
+
+@pytest.fixture(scope="module")
+def lot():
+    return simul_obj_client_batch(20, seed=7)
+
+
+@pytest.fixture(scope="module")
+def lot_compact():
+    return simul_obj_client_batch(20, seed=7, compact=True)
+
+
+@pytest.mark.parametrize("compact", [False, True])
+@pytest.mark.parametrize("i", range(20))
+def test_build_identique_a_impute_json(gabarit, lot, lot_compact, i, compact):
+    p1 = client_from_batch(lot_compact if compact else lot, i)
+    attendu = copy.deepcopy(gabarit)
+    impute_json(attendu, p1)
+    assert ImputeurJson(gabarit).build(p1) == attendu
+
+
+def test_build_client_des_formulaires(gabarit):
+    p1 = simul_obj_client_from_dicts(situation_dict, montants_fin, montants_immo, montants_pro, montants_emprunt)
+    attendu = copy.deepcopy(gabarit)
+    impute_json(attendu, p1)
+    assert ImputeurJson(gabarit).build(p1) == attendu
+
+
+def _vider(obj):
+    """Vide récursivement tous les conteneurs de obj."""
+    for valeur in list(obj.values() if isinstance(obj, dict) else obj):
+        if isinstance(valeur, (dict, list)):
+            _vider(valeur)
+    obj.clear()
+
+
+def test_payloads_independants(gabarit, lot):
+    imputeur = ImputeurJson(gabarit)
+    premier = imputeur.build(client_from_batch(lot, 0))
+    reference = copy.deepcopy(premier)
+    # un payload modifié ne touche ni le gabarit, ni les autres payloads, ni les suivants
+    _vider(imputeur.build(client_from_batch(lot, 1)))
+    assert premier == reference
+    assert imputeur.build(client_from_batch(lot, 0)) == reference
+    assert imputeur.gabarit == gabarit
@@ -0,0 +1,30 @@
+import os
+import sys
+import json
+import subprocess
+
+from helpers.mock_server import MockKlemoServer
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_charge_sans_coalescence(tmp_path):
+    """Des personas identiques en vol en même temps envoient chacun leurs requêtes au serveur."""
+    serveur = MockKlemoServer(("127.0.0.1", 0), polls=1)
+    serveur.start()
+    try:
+        rapport = tmp_path / "rapport.json"
+        env = {**os.environ, "KLEMO_API_BASE": serveur.base_url, "KLEMO_CACHE": "0"}
+        subprocess.run([sys.executable, "-m", "helpers.loadtest", "-n", "12", "--payloads", "json/t1.json",
+                        "--concurrence", "6", "--json", str(rapport)],
+                       cwd=RACINE, env=env, check=True, capture_output=True, timeout=300)
+        resultat = json.loads(rapport.read_text(encoding="utf-8"))
+    finally:
+        serveur.shutdown()
+        serveur.server_close()
+
+    assert resultat["personas"] == 12
+    assert resultat["ok"] == 12
+    assert serveur.nb_requetes["fill-score"] == 12
+    assert serveur.nb_requetes["proj"] == 12
+    assert serveur.nb_requetes["strat_init"] == 12
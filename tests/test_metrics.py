@@ -0,0 +1,52 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from helpers import metrics
+from helpers.metrics import Histogramme, Metriques, enregistrer, lier_session
+
+
+class _Etat(dict):
+    """st.session_state minimal : accès par attribut."""
+    __getattr__ = dict.__getitem__
+    __setattr__ = dict.__setitem__
+
+
+@pytest.fixture
+def session(monkeypatch):
+    """Une session Streamlit simulée, visible du seul thread principal comme avec Streamlit."""
+    principal = threading.current_thread()
+    monkeypatch.setattr(metrics, "get_script_run_ctx",
+                        lambda suppress_warning=False: object() if threading.current_thread() is principal else None)
+    monkeypatch.setattr(metrics.st, "session_state", _Etat())
+    monkeypatch.setattr(metrics, "METRIQUES_PROCESSUS", Metriques())
+    return metrics.metriques_session()
+
+
+def _endpoints(metriques):
+    return {ligne["endpoint"] for ligne in metriques.resume()}
+
+
+def test_thread_lie_compte_pour_la_session(session):
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        executor.submit(lier_session(enregistrer), "lie", wall=0.1).result()
+        executor.submit(enregistrer, "non_lie", wall=0.1).result()
+        # la liaison ne reste pas sur le thread réutilisé
+        executor.submit(enregistrer, "apres", wall=0.1).result()
+    assert _endpoints(session) == {"lie"}
+    assert _endpoints(metrics.METRIQUES_PROCESSUS) == {"lie", "non_lie", "apres"}
+
+
+def test_sans_session_fn_inchangee(monkeypatch):
+    monkeypatch.setattr(metrics, "get_script_run_ctx", lambda suppress_warning=False: None)
+    assert lier_session(enregistrer) is enregistrer
+
+
+def test_percentiles_bornes():
+    h = Histogramme(precision=0.01)
+    for valeur in range(1, 1001):
+        h.ajouter(valeur / 1000)
+    assert h.percentile(50) == pytest.approx(0.5, rel=0.01)
+    assert h.percentile(99) == pytest.approx(0.99, rel=0.01)
+    assert h.percentile(100) <= h.max
@@ -0,0 +1,56 @@
+import asyncio
+import threading
+
+from helpers import func, jobs
+from helpers.pipeline import paires_objectifs, run_objectifs, verrou_strat
+
+
+def _titre(output):
+    return output[0]["texteStrat"]["titre"]
+
+
+def _attendu(objectif, sous_objectif):
+    return (f"Reco simulée {func.MAPPINGS_OBJECTIF_CHOICES[objectif]}"
+            f"/{func.MAPPINGS_OBJECTIF_CHOICES[sous_objectif]}")
+
+
+def test_strats_du_meme_proj_ne_se_chevauchent_pas(api_simulee):
+    """Une reco lancée pendant la comparaison des objectifs garde son propre résultat."""
+    strat = {"requestId": "proj-1", "requestKey": "mock/proj-1",
+             "paramObjectif": {"debut": "2030-12-10", "horizon": 20},
+             "investorProfile": {"level": "Dynamic", "esg": "Neutral"}}
+    paires = paires_objectifs()[:4]
+    objectif, sous_objectif = paires_objectifs()[-1]
+    reco = {}
+
+    def lancer_reco():
+        payload = {**strat, "objectif": func.MAPPINGS_OBJECTIF_CHOICES[objectif],
+                   "sousObjectif": func.MAPPINGS_OBJECTIF_CHOICES[sous_objectif]}
+        reco.update(jobs.job_strat(jobs.Job("job_strat"), payload, objectif, sous_objectif))
+
+    async def comparer():
+        thread = threading.Thread(target=lancer_reco)
+        resultats = []
+        async for resultat in run_objectifs(strat, paires):
+            if not resultats:
+                thread.start()
+            resultats.append(resultat)
+        thread.join(10)
+        return resultats
+
+    resultats = asyncio.run(comparer())
+
+    assert [r["statut"] for r in resultats] == ["ok"] * len(paires)
+    for resultat, (o, so) in zip(resultats, paires):
+        assert _titre(resultat["output"]) == _attendu(o, so)
+    assert _titre(reco["output"]) == _attendu(objectif, sous_objectif)
+    assert api_simulee.nb_requetes["strat_init"] == len(paires) + 1
+
+
+def test_verrou_strat_par_request_id():
+    with verrou_strat("a"):
+        assert verrou_strat("a").acquire(blocking=False) is False
+        autre = verrou_strat("b")
+        assert autre.acquire(blocking=False) is True
+        autre.release()
+    assert verrou_strat("a").acquire(blocking=False) is True
@@ -0,0 +1,81 @@
+import numpy as np
+import pyarrow as pa
+import pytest
+
+from helpers import population
+from helpers.population import CLE_VOCABULAIRES, Population
+from helpers.simul_contraint_main_sous_cat_v2 import (
+    CHAMPS_CATEGORIELS, SECTIONS_LIGNES, VOCABULAIRES, Vocabulaire, client_from_batch, decoder_section,
+    encoder_section, simul_obj_client_batch)
+
+
+@pytest.fixture(scope="module")
+def lot():
+    return simul_obj_client_batch(50, seed=3, compact=True)
+
+
+def test_vocabulaire_encode_decode():
+    vocabulaire = Vocabulaire(["livret", "pea", "livret", "av"])
+    assert vocabulaire.libelles == ("livret", "pea", "av")
+    codes = vocabulaire.encoder(np.array([["av", "livret"], ["pea", "av"]]))
+    assert codes.dtype == np.int16
+    assert codes.tolist() == [[2, 0], [1, 2]]
+    assert vocabulaire.decoder(codes).tolist() == [["av", "livret"], ["pea", "av"]]
+
+
+def test_vocabulaire_libelle_inconnu():
+    with pytest.raises(ValueError, match="hors vocabulaire"):
+        Vocabulaire(["a", "b"]).encoder(["a", "c"])
+
+
+@pytest.mark.parametrize("section", SECTIONS_LIGNES)
+def test_sections_compactes_aller_retour(lot, section):
+    compact = lot[section]
+    decode = decoder_section(compact, section)
+    assert decode.dtype != compact.dtype
+    assert decoder_section(decode, section) is decode
+    np.testing.assert_array_equal(encoder_section(decode, section), compact)
+    for nom in CHAMPS_CATEGORIELS[section]:
+        assert set(decode[nom]) <= set(VOCABULAIRES[nom].libelles)
+
+
+def _egaux(a, b):
+    assert a.keys() == b.keys()
+    for section in a:
+        np.testing.assert_array_equal(a[section], b[section])
+
+
+def test_parquet_aller_retour(lot, tmp_path):
+    Population.from_batch(lot).to_parquet(tmp_path)
+    relue = Population.read_parquet(tmp_path)
+    assert len(relue) == 50
+    for i in (0, 17, 49, -1):
+        _egaux(relue.client(i), client_from_batch(lot, i % 50))
+
+
+def test_parquet_recode_un_vocabulaire_different(lot, tmp_path, monkeypatch):
+    # fichier écrit avec un vocabulaire typeProd dans l'ordre inverse
+    libelles = VOCABULAIRES["typeProd"].libelles
+    inverse = libelles[::-1]
+    ancien = dict(lot, fin=lot["fin"].copy())
+    ancien["fin"]["typeProd"] = len(libelles) - 1 - lot["fin"]["typeProd"]
+    monkeypatch.setitem(population.VOCABULAIRES_CODES, "typeProd", inverse)
+    Population.from_batch(ancien).to_parquet(tmp_path)
+    monkeypatch.setitem(population.VOCABULAIRES_CODES, "typeProd", libelles)
+
+    relue = Population.read_parquet(tmp_path)
+    np.testing.assert_array_equal(relue.section("fin"), lot["fin"])
+
+
+def test_parquet_libelle_hors_vocabulaire(lot, tmp_path, monkeypatch):
+    monkeypatch.setitem(population.VOCABULAIRES_CODES, "typeProd", ("inconnu",) + VOCABULAIRES["typeProd"].libelles)
+    Population.from_batch(lot).to_parquet(tmp_path)
+    monkeypatch.setitem(population.VOCABULAIRES_CODES, "typeProd", VOCABULAIRES["typeProd"].libelles)
+    with pytest.raises(ValueError, match="hors vocabulaire"):
+        Population.read_parquet(tmp_path)
+
+
+def test_vocabulaires_dans_le_schema(lot):
+    table = Population.from_batch(lot).tables["fin"]
+    assert isinstance(table, pa.Table)
+    assert CLE_VOCABULAIRES in table.schema.metadata
@@ -0,0 +1,47 @@
+import json
+
+import pytest
+
+from helpers import func
+from helpers import projection
+from helpers.cache import cle_cache
+from helpers.projection import PROJECTION_PROJ, projeter, valider_projection
+
+PAYLOAD = {"Client": {"PatClientDetailAdj": [{"age": 40}], "PatClientDetail": [{"age": 40}]},
+           "DataScore": {"score": 1}}
+
+
+def test_projeter_garde_les_sections_de_la_spec():
+    projete = projeter(PAYLOAD, PROJECTION_PROJ)
+    assert projete == {"Client": {"PatClientDetailAdj": [{"age": 40}]}}
+    assert "DataScore" in PAYLOAD
+
+
+def test_refus_contre_un_serveur_local(api_simulee, tmp_path):
+    assert func.API_LOCALE
+    with pytest.raises(ValueError):
+        valider_projection(func.PROJ_URL, [("t", PAYLOAD)], PROJECTION_PROJ, str(tmp_path), enregistrer=True)
+    with pytest.raises(SystemExit) as sortie:
+        projection.main(["json/t1.json", "--enregistrements", str(tmp_path)])
+    assert sortie.value.code != 0
+    assert not list(tmp_path.iterdir())
+
+
+def test_sans_reference_enregistree_pas_de_validation(api_simulee, monkeypatch, tmp_path):
+    # comme contre l'API réelle, mais sans --enregistrer : rien n'est demandé ni écrit
+    monkeypatch.setattr(func, "API_LOCALE", False)
+    rapport = valider_projection(func.PROJ_URL, [("t", PAYLOAD)], PROJECTION_PROJ, str(tmp_path))
+    assert rapport[0]["ecarts"] == ["reference non enregistree"]
+    assert not list(tmp_path.iterdir())
+    assert api_simulee.nb_requetes["proj"] == 0
+
+
+def test_reference_enregistree_comparee(api_simulee, monkeypatch, tmp_path):
+    monkeypatch.setattr(func, "API_LOCALE", False)
+    dossier = tmp_path / "proj"
+    dossier.mkdir()
+    (dossier / f"{cle_cache('proj', PAYLOAD)}.json").write_text(json.dumps({"output": {"autre": 1}}))
+    rapport = valider_projection(func.PROJ_URL, [("t", PAYLOAD)], PROJECTION_PROJ, str(tmp_path))
+    # le serveur simulé ne rend pas la référence : écart signalé
+    assert rapport[0]["ecarts"]
+    assert api_simulee.nb_requetes["proj"] == 1
@@ -0,0 +1,74 @@
+import json
+
+from helpers import store
+from helpers.store import FACTEUR_DECODE, MagasinResultats, cle_resultat
+
+
+def _taille(objet):
+    return len(json.dumps(objet, separators=(",", ":"), ensure_ascii=False).encode("utf-8"))
+
+
+def test_contenu_identique_deduplique():
+    magasin = MagasinResultats(taille_max=10_000)
+    a = magasin.mettre({"x": 1, "y": [1, 2]})
+    b = magasin.mettre({"y": [1, 2], "x": 1})
+    assert a == b == cle_resultat({"x": 1, "y": [1, 2]})
+    stats = magasin.stats()
+    assert stats["entrees"] == 1 and stats["dedupliques"] == 1
+    assert magasin.lire(a) == {"x": 1, "y": [1, 2]}
+
+
+def test_eviction_lru():
+    objets = [{"n": i, "donnees": "x" * 100} for i in range(3)]
+    magasin = MagasinResultats(taille_max=2 * _taille(objets[0]))
+    cles = [magasin.mettre(objet) for objet in objets[:2]]
+    magasin.mettre(objets[2])
+    assert magasin.lire(cles[0]) is None
+    assert magasin.lire(cles[1]) == objets[1]
+    assert magasin.stats()["evinces"] == 1
+
+
+def test_decodes_comptes_dans_le_budget():
+    objet = {"donnees": "x" * 100}
+    magasin = MagasinResultats(taille_max=10_000)
+    cle = magasin.mettre(objet)
+    assert magasin.stats()["octets"] == _taille(objet)
+    premier = magasin.lire(cle)
+    assert magasin.lire(cle) is premier
+    stats = magasin.stats()
+    assert stats["decodes"] == 1
+    assert stats["octets"] == _taille(objet) * (1 + FACTEUR_DECODE)
+
+
+def test_decodes_evinces_avant_les_entrees():
+    objets = [{"n": i, "donnees": "x" * 100} for i in range(2)]
+    taille = _taille(objets[0])
+    magasin = MagasinResultats(taille_max=2 * taille + FACTEUR_DECODE * taille)
+    cles = [magasin.mettre(objet) for objet in objets]
+    magasin.lire(cles[0])
+    assert magasin.stats()["decodes"] == 1
+    # le second décodé dépasse le budget : le premier décodé part, pas les entrées
+    magasin.lire(cles[1])
+    stats = magasin.stats()
+    assert stats["entrees"] == 2 and stats["decodes"] == 1 and stats["evinces"] == 0
+    assert stats["octets"] <= magasin.taille_max
+
+
+def test_debordement_sur_disque(tmp_path):
+    objets = [{"n": i, "donnees": "x" * 100} for i in range(2)]
+    magasin = MagasinResultats(taille_max=_taille(objets[0]), dossier=str(tmp_path))
+    cles = [magasin.mettre(objet) for objet in objets]
+    assert magasin.stats()["entrees"] == 1
+    assert magasin.lire(cles[0]) == objets[0]
+    assert magasin.stats()["disque"]["entrees"] >= 1
+
+
+def test_modifier_ne_touche_pas_l_original(monkeypatch):
+    monkeypatch.setattr(store, "STORE", MagasinResultats(taille_max=10_000))
+    monkeypatch.setattr(store.st, "session_state", {})
+    store.garder("base_t1", {"Client": {"age": 30}})
+    copie = store.modifier("base_t1")
+    copie["Client"]["age"] = 40
+    assert store.reprendre("base_t1") == {"Client": {"age": 30}}
+    store.garder("base_t1", copie)
+    assert store.reprendre("base_t1") == {"Client": {"age": 40}}